@@ -4,13 +4,15 @@ from nmigen.build import Platform
 from skeleton import ElaboratableAbstract
 from opcodes import OpAlu
 from skeleton import as_signed
+from toolbox.adder import make_adder
 
 class ALU(ElaboratableAbstract):
-    def __init__(self, xlen, pfx="", include_invalid_op=False):
+    def __init__(self, xlen, pfx="", include_invalid_op=False, adder="yosys"):
         """
             xlen - number of bits for operands
             pfx - prefix in signal names, if specified, additional '_' to the end will be attached
             include_invalid_op - if True, adds output ping `invalid_op` that shows that `op` was unrecognized
+            adder - adder used by ADD: "yosys" leaves `+` to synthesis, otherwise one of toolbox.adder.ADDERS
         """
         super().__init__()
         if pfx:
@@ -22,18 +24,27 @@ class ALU(ElaboratableAbstract):
         self.en = self.add_input_signal(name=f"{pfx}en")
         self.output = self.add_output_signal(xlen, name=f"{pfx}output")
         self.invalid_op : Optional[Signal] = self.add_output_signal(name=f"{pfx}invalid") if include_invalid_op else None
+        self.adder = make_adder(adder, xlen)
     
     def elaborate(self, p:Platform) -> Module:
         m = Module()
         comb = m.d.comb    
         signed_lhs = as_signed(m,self.lhs)
         signed_rhs = as_signed(m,self.rhs)
+        if self.adder is None:
+            add_result = self.lhs + self.rhs
+        else:
+            m.submodules.adder = self.adder
+            comb += self.adder.x.eq(self.lhs)
+            comb += self.adder.y.eq(self.rhs)
+            comb += self.adder.carry0.eq(0)
+            add_result = self.adder.out[:self.xlen]
         with m.If(self.en):
             if self.invalid_op is not None:
                 comb += self.invalid_op.eq(0)
             with m.Switch(self.op):
                 with m.Case(OpAlu.ADD):                    
-                    comb += self.output.eq(self.lhs + self.rhs)
+                    comb += self.output.eq(add_result)
                 with m.Case(OpAlu.SLT):
                     comb += self.output.eq(Mux(signed_lhs < signed_rhs, 1, 0))
                 with m.Case(OpAlu.SLTU):
@@ -59,9 +70,13 @@ from nmigen.asserts import Assert
 from nmigen.cli import main_parser, main_runner
 
 def __main():
+    parser = main_parser()
+    parser.add_argument("--adder", type=str, default="yosys", help="adder of ALU")
+    args = parser.parse_args()
+
     m = Module()
     xlen=32
-    m.submodules.alu1 = alu1 = ALU(xlen, "A", include_invalid_op=True)
+    m.submodules.alu1 = alu1 = ALU(xlen, "A", include_invalid_op=True, adder=args.adder)
     m.submodules.alu2 = alu2 = ALU(xlen, "B")
 
     op = Signal(OpAlu)
@@ -134,8 +149,6 @@ def __main():
         m.d.comb += Assert(alu2.output == 0)
 
 
-    parser = main_parser()
-    args = parser.parse_args()
     main_runner(parser, args, m, ports = ports + alu1.ports() + alu2.ports())
 
 
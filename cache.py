@@ -0,0 +1,277 @@
+from typing import Callable, Optional
+
+from nmigen import Module, Signal, Memory, Cat, Mux, Const, Value
+from nmigen.build import Platform
+
+from skeleton import ElaboratableAbstract
+from membus import MemoryBus
+
+
+class ReadCache(ElaboratableAbstract):
+    """ Read-only set-associative cache between `upstream` bus (core side) and `downstream` bus (memory side).
+
+        Cached requests are word-aligned requests accepted by `cacheable(upstream)`, everything else
+        passes through to downstream unchanged. Hit is answered combinationally in the cycle of request.
+        Miss keeps upstream.ready low while the whole line is read from downstream (bursts are used if
+        downstream has several lanes), the request is answered from the cache on the next cycle.
+        Upstream lanes are served while they stay inside the line.
+        Memory is never written by the core, so lines are never invalidated.
+
+        size  - capacity in bytes
+        line  - line length in bytes
+        ways  - associativity, ways are replaced round-robin
+
+        hits   - number of requests answered from the cache
+        misses - number of line refills
+    """
+    def __init__(self, upstream : MemoryBus, downstream : MemoryBus, size=256, line=16, ways=1,
+            cacheable : Optional[Callable[[MemoryBus], Value]] = None, prefix="cache", domain="i"):
+        super().__init__()
+        xlen = len(upstream.value)
+        assert len(downstream.value) == xlen, "buses must have the same word size"
+        assert xlen % 8 == 0, "word must be octet aligned"
+        self.word_bytes = xlen // 8
+        assert line % self.word_bytes == 0 and is_power_of_2(line // self.word_bytes), "line must be power of 2 words"
+        assert size % (line * ways) == 0 and is_power_of_2(size // (line * ways)), "number of sets must be power of 2"
+
+        self.upstream = upstream
+        self.downstream = downstream
+        self.xlen = xlen
+        self.size = size
+        self.line = line
+        self.ways = ways
+        self.cacheable = cacheable if cacheable is not None else (lambda bus: 1)
+        self.prefix = prefix
+        self.domain = domain
+
+        self.line_words = line // self.word_bytes
+        self.sets = size // (line * ways)
+        self.offset_bits = log2(self.word_bytes)
+        self.word_bits = log2(self.line_words)
+        self.set_bits = log2(self.sets)
+        self.tag_bits = len(upstream.addr) - self.offset_bits - self.word_bits - self.set_bits
+
+        self.data = [Memory(width=self.line_words * xlen, depth=self.sets, name=f"{prefix}_data{w}") for w in range(ways)]
+        self.tags = [Memory(width=self.tag_bits, depth=self.sets, name=f"{prefix}_tag{w}") for w in range(ways)]
+        self.line_valid = [Signal(self.sets, name=f"{prefix}_valid{w}") for w in range(ways)]
+
+        self.hits = self.add_output_signal(32, name=f"{prefix}_hits")
+        self.misses = self.add_output_signal(32, name=f"{prefix}_misses")
+
+        self.add_existing_input_signal(upstream.addr)
+        self.add_existing_input_signal(upstream.en)
+        self.add_existing_input_signal(upstream.seq)
+        self.add_existing_output_signal(upstream.value)
+        self.add_existing_output_signal(upstream.ready)
+        burst_inputs, burst_outputs = upstream.burst_ports()
+        for signal in burst_inputs:
+            self.add_existing_input_signal(signal)
+        for signal in burst_outputs:
+            self.add_existing_output_signal(signal)
+
+        self.add_existing_output_signal(downstream.addr)
+        self.add_existing_output_signal(downstream.en)
+        self.add_existing_output_signal(downstream.seq)
+        self.add_existing_input_signal(downstream.value)
+        self.add_existing_input_signal(downstream.ready)
+        burst_outputs, burst_inputs = downstream.burst_ports()
+        for signal in burst_outputs:
+            self.add_existing_output_signal(signal)
+        for signal in burst_inputs:
+            self.add_existing_input_signal(signal)
+
+    def split_address(self, addr : Value):
+        """ Return (word in line, set, tag) of the address """
+        word_start = self.offset_bits
+        set_start = word_start + self.word_bits
+        tag_start = set_start + self.set_bits
+        return addr[word_start:set_start], addr[set_start:tag_start], addr[tag_start:]
+
+    def refill_cycles(self) -> int:
+        """ Cycles a miss stalls upstream when downstream is ready every cycle: the miss itself and line transfer """
+        return 1 + -(-self.line_words // self.downstream.lanes)
+
+    def lines_spanned(self, length : int) -> int:
+        """ Most lines `length` bytes read in sequence from a word-aligned address can touch """
+        return (self.line - self.word_bytes + length - 1) // self.line + 1
+
+    def elaborate(self, p:Platform) -> Module:
+        m = Module()
+        comb = m.d.comb
+        sync = m.d[self.domain]
+        up, down = self.upstream, self.downstream
+        prefix = self.prefix
+        xlen = self.xlen
+
+        word, set_index, tag = self.split_address(up.addr)
+
+        refilling = Signal(name=f"{prefix}_refilling")
+        refill_addr = Signal.like(up.addr, name=f"{prefix}_refill_addr")
+        refill_word = Signal(range(self.line_words + 1), name=f"{prefix}_refill_word")
+        refill_way = Signal(range(self.ways), name=f"{prefix}_refill_way")
+        victim = Signal(range(self.ways), name=f"{prefix}_victim")
+        just_refilled = Signal(name=f"{prefix}_just_refilled")
+        _, refill_set, refill_tag = self.split_address(refill_addr)
+
+        cacheable = Signal(name=f"{prefix}_cacheable")
+        hit = Signal(name=f"{prefix}_hit")
+        hit_line = Signal(self.line_words * xlen, name=f"{prefix}_hit_line")
+        comb += cacheable.eq(up.en & (up.addr[:self.offset_bits] == 0) & self.cacheable(up))
+
+        # lookup: every way is read at set_index, matching way provides the line
+        way_hits = []
+        hit_lines = []
+        write_ports = []
+        for w in range(self.ways):
+            m.submodules[f"data_r{w}"] = data_r = self.data[w].read_port(domain="comb")
+            m.submodules[f"data_w{w}"] = data_w = self.data[w].write_port(domain=self.domain, granularity=xlen)
+            m.submodules[f"tag_r{w}"] = tag_r = self.tags[w].read_port(domain="comb")
+            m.submodules[f"tag_w{w}"] = tag_w = self.tags[w].write_port(domain=self.domain)
+            comb += data_r.addr.eq(set_index)
+            comb += tag_r.addr.eq(set_index)
+            comb += data_w.addr.eq(refill_set)
+            comb += tag_w.addr.eq(refill_set)
+            comb += tag_w.data.eq(refill_tag)
+
+            way_hit = Signal(name=f"{prefix}_hit{w}")
+            comb += way_hit.eq(self.line_valid[w].bit_select(set_index, 1) & (tag_r.data == tag))
+            way_hits.append(way_hit)
+            hit_lines.append(Mux(way_hit, data_r.data, 0))
+            write_ports.append((data_w, tag_w))
+        comb += hit.eq(Cat(*way_hits).any())
+        comb += hit_line.eq(self.build_tree_or(hit_lines))
+
+        # refill: downstream lane j carries word refill_word + j of the line
+        accepted = Signal(down.lanes, name=f"{prefix}_accepted")
+        line_done = Signal(name=f"{prefix}_line_done")
+        with m.If(refilling):
+            for j in range(down.lanes):
+                lane_valid = down.valid[j] if down.valid is not None else 1
+                comb += accepted[j].eq(down.ready & lane_valid & (refill_word + j < self.line_words))
+        comb += line_done.eq(refill_word + sum(accepted[j] for j in range(down.lanes)) >= self.line_words)
+
+        for w, (data_w, tag_w) in enumerate(write_ports):
+            selected = refill_way == w
+            for i in range(self.line_words):
+                lanes = [(accepted[j] & (refill_word + j == i), down.values[j]) for j in range(down.lanes)]
+                comb += data_w.en[i].eq(selected & self.build_tree_or([cond for cond, _ in lanes]))
+                value = lanes[-1][1]
+                for cond, lane_value in reversed(lanes[:-1]):
+                    value = Mux(cond, lane_value, value)
+                comb += data_w.data.word_select(i, xlen).eq(value)
+            comb += tag_w.en.eq(refilling & line_done & selected)
+
+        sync += just_refilled.eq(0)
+        with m.If(refilling):
+            comb += down.en.eq(1)
+            comb += down.seq.eq(1)
+            comb += down.addr.eq(refill_addr + (refill_word << self.offset_bits))
+            if down.burst is not None:
+                comb += down.burst.eq(down.lanes)
+            sync += refill_word.eq(refill_word + sum(accepted[j] for j in range(down.lanes)))
+            with m.If(line_done):
+                sync += refilling.eq(0)
+                sync += just_refilled.eq(1)
+                for w in range(self.ways):
+                    with m.If(refill_way == w):
+                        sync += self.line_valid[w].bit_select(refill_set, 1).eq(1)
+        with m.Elif(cacheable):
+            with m.If(hit):
+                comb += up.ready.eq(1)
+                for j, value in enumerate(up.values):
+                    comb += value.eq(hit_line.word_select(word + j, xlen))
+                if up.valid is not None:
+                    for j in range(up.lanes):
+                        comb += up.valid[j].eq((j < up.burst) & (word + j < self.line_words))
+                with m.If(~just_refilled):
+                    sync += self.hits.eq(self.hits + 1)
+            with m.Else():
+                sync += refilling.eq(1)
+                sync += refill_addr.eq(Cat(Const(0, self.offset_bits + self.word_bits), up.addr[self.offset_bits + self.word_bits:]))
+                sync += refill_word.eq(0)
+                sync += refill_way.eq(victim)
+                sync += victim.eq(Mux(victim == self.ways - 1, 0, victim + 1))
+                sync += self.misses.eq(self.misses + 1)
+        with m.Else():
+            self.elaborate_bypass(m)
+        return m
+
+    def elaborate_bypass(self, m : Module):
+        """ Connect upstream to downstream as if there was no cache """
+        comb = m.d.comb
+        up, down = self.upstream, self.downstream
+
+        comb += down.en.eq(up.en)
+        comb += down.addr.eq(up.addr)
+        comb += down.seq.eq(up.seq)
+        comb += up.ready.eq(down.ready)
+        for j in range(min(up.lanes, down.lanes)):
+            comb += up.values[j].eq(down.values[j])
+        if down.burst is not None:
+            comb += down.burst.eq(1 if up.burst is None else Mux(up.burst > down.lanes, down.lanes, up.burst))
+        if up.valid is not None:
+            for j in range(up.lanes):
+                if j == 0:
+                    lane_valid = down.valid[0] if down.valid is not None else 1
+                elif j < down.lanes:
+                    lane_valid = down.valid[j]
+                else:
+                    lane_valid = 0
+                comb += up.valid[j].eq(lane_valid)
+
+
+def is_power_of_2(n : int) -> bool:
+    return n > 0 and (n & (n - 1)) == 0
+
+def log2(n : int) -> int:
+    assert is_power_of_2(n)
+    return n.bit_length() - 1
+
+
+#
+# FORMAL VERIFICATION
+#
+from nmigen.asserts import Assert, Assume, AnyConst
+from nmigen.cli import main_parser, main_runner
+from clock_info import ClockInfo
+
+def __main():
+    """ Cache is transparent: anything it answers is what memory holds.
+
+        Memory is modeled by one arbitrary word `data` at arbitrary aligned address `addr`,
+        other addresses are unconstrained. If cache ever answers request for `addr`,
+        answer must be `data`. As ProofOverTicks suites don't constrain mem2core inputs,
+        they hold for the core behind the cache as well.
+    """
+    parser = main_parser()
+    parser.add_argument("--ways", type=int, default=2)
+    parser.add_argument("--lanes", type=int, default=2)
+    args = parser.parse_args()
+
+    m = Module()
+    clock = ClockInfo("i")
+    m.domains.i = clock.domain
+    comb = m.d.comb
+
+    up = MemoryBus(32, 32, "up", lanes=args.lanes)
+    down = MemoryBus(32, 32, "down", lanes=args.lanes)
+    m.submodules.cache = cache = ReadCache(up, down, size=64, line=16, ways=args.ways, cacheable=lambda bus: bus.seq)
+
+    addr = AnyConst(32)
+    data = AnyConst(32)
+    comb += Assume(addr[:2] == 0)
+
+    for j in range(down.lanes):
+        lane_valid = down.valid[j] if down.valid is not None else 1
+        with m.If(down.en & down.ready & lane_valid & (down.addr + j * 4 == addr)):
+            comb += Assume(down.values[j] == data)
+
+    for j in range(up.lanes):
+        lane_valid = up.valid[j] if up.valid is not None else 1
+        with m.If(up.en & up.ready & lane_valid & (up.addr + j * 4 == addr)):
+            comb += Assert(up.values[j] == data)
+
+    main_runner(parser, args, m, ports=cache.ports() + [clock.clk, clock.rst])
+
+if __name__ == "__main__":
+    __main()
@@ -1,35 +1,47 @@
 import os
 import re
 import sys
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union, Tuple
 import importlib
 
-from nmigen import Elaboratable, Module, Signal, signed, unsigned, Cat, ClockDomain, ClockSignal, Const, Array, ResetSignal, Value
+from nmigen import Elaboratable, Module, Signal, signed, unsigned, Cat, Mux, ClockDomain, ClockSignal, Const, Array, ResetSignal, Value
 from nmigen.hdl.ast import Statement
 from nmigen.asserts import Assert, Assume, Past, Cover
-from nmigen.back.pysim import Simulator, Delay
+from nmigen.back.pysim import Simulator, Delay, Settle
 from nmigen.build import Platform
 from nmigen.cli import main_parser, main_runner
 from enum import IntEnum
-from skeleton import ElaboratableAbstract, fix_gtkw_win, dump_inputs, SeqPast
+from skeleton import ElaboratableAbstract, fix_gtkw_win, dump_inputs, SeqPast, CycleTrace
 from skeleton import muS
 
 from instruction import Instruction
-from opcodes import DebugOpcode, OpAlu
-from register_file import RegisterFile, RegisterFileModule
+from opcodes import DebugOpcode, OpAlu, Opcode, OpSystem
+from register_file import RegisterFile, RegisterFileModule, RegisterFileMemoryModule
 from encoding import IType, UType, JType, BType
 from clock_info import ClockInfo
 from alu import ALU
 from shifter import Shifter
 from membus import MemoryBus
+from fakemem import FakeMemory
+from toolbox.adder import make_adder
+from cache import ReadCache
 
 class Core(ElaboratableAbstract):
-    def __init__(self, clock, look_ahead=1, addr_length=32, xlen=32, include_enable=False, include_debug_opcode=1):
+    # units instructions call through call_*(), core built with `units` has only the listed ones
+    UNITS = ["alu", "shifter", "address_adder"]
+
+    def __init__(self, clock, look_ahead=1, addr_length=32, xlen=32, include_enable=False, include_debug_opcode=1, bus_lanes=1, dispatch="priority", regfile="array", adder="yosys", shifter="split", units : Optional[List[str]] = None):
         assert addr_length % 8 == 0, "address length must be octet aligned"
         assert xlen % 8 == 0, "register width must be octet aligned"
 
         assert look_ahead >= 1, "Core should see at least one full word ahead"
         self.look_ahead = look_ahead
+        # "priority" selects instruction by if/elif chain over Instruction.check(), "switch" by Instruction.dispatch_keys()
+        assert dispatch in ("priority", "switch"), f"unknown dispatch mode {dispatch}"
+        self.dispatch = dispatch
+        units = Core.UNITS if units is None else units
+        assert all(unit in Core.UNITS for unit in units), f"unknown units {units}, expected some of {Core.UNITS}"
+        self.units = set(units)
         super().__init__()
         self.clock = clock
 
@@ -39,12 +51,17 @@ class Core(ElaboratableAbstract):
         self.addr_length = addr_length
 
         # add mem2core bus for reads
-        self.mem2core = mem2core = MemoryBus(addr_length, xlen, "mem2core")
+        self.mem2core = mem2core = MemoryBus(addr_length, xlen, "mem2core", lanes=bus_lanes)
         self.add_existing_output_signal(mem2core.addr)
         self.add_existing_output_signal(mem2core.en)
         self.add_existing_output_signal(mem2core.seq)
         self.add_existing_input_signal(mem2core.ready)
         self.add_existing_input_signal(mem2core.value)
+        burst_outputs, burst_inputs = mem2core.burst_ports()
+        for signal in burst_outputs:
+            self.add_existing_output_signal(signal)
+        for signal in burst_inputs:
+            self.add_existing_input_signal(signal)
 
         # add core2mem bus for writes
         self.core2mem = core2mem = MemoryBus(addr_length, xlen, "core2mem")
@@ -77,18 +94,48 @@ class Core(ElaboratableAbstract):
         self.last_instruction_valid = Signal() #if true, continue execution from last_instruction, otherwise from input[0]
         self.current_instruction_valid = Signal()
         self.have_valid_instruction = Signal()
+        # instruction starts to execute this cycle: it's fetched and core is out of reset and enabled
+        self.instruction_started = Signal()
         self.current_instruction = Signal(32)
 
         self.cycle = Signal(4)
         self.next_pc = Signal(xlen)
         self.advance_pc = Signal()
 
-        self.alu =  ALU(self.xlen, "alu")
-        self.left_shifter = Shifter(xlen, Shifter.LEFT, "SL")
-        self.right_shifter = Shifter(xlen, Shifter.RIGHT, "SR")
-        self.register_file = RegisterFileModule(xlen)        
+        # adder of ALU and of load/jump/branch addresses, see toolbox.adder.ADDERS
+        # units missing from self.units are None
+        self.alu = ALU(self.xlen, "alu", adder=adder) if "alu" in self.units else None
+        self.address_adder = make_adder(adder, xlen) if "address_adder" in self.units else None
+        # "split" has separate left and right shifters, "unified" shares one right shifter for both directions
+        assert shifter in ("split", "unified"), f"unknown shifter {shifter}"
+        if "shifter" not in self.units:
+            self.left_shifter = self.right_shifter = self.shifter = None
+        elif shifter == "split":
+            self.left_shifter = Shifter(xlen, Shifter.LEFT, "SL")
+            self.right_shifter = Shifter(xlen, Shifter.RIGHT, "SR")
+            self.shifter = None
+        else:
+            self.left_shifter = self.right_shifter = None
+            self.shifter = Shifter(xlen, Shifter.BOTH, "SH")
+        # "array" keeps GPRs in flip-flops visible to proofs, "memory" uses nmigen Memory
+        assert regfile in ("array", "memory"), f"unknown register file {regfile}"
+        self.register_file = RegisterFileModule(xlen) if regfile == "array" else RegisterFileMemoryModule(xlen)
+
+        # bus where memory must be attached: mem2core or downstream bus of the last cache
+        self.memory_bus = mem2core
+        self.caches : List[ReadCache] = []
         
         self.pc = Signal(xlen, name="pc") #TODO: remove from register file? use additional signals in regfile?
+
+        # Prefetch buffer keeps up to look_ahead-1 instructions that follow pc, one more word is on mem2core.
+        # prefetch_data[0] is instruction at prefetch_base
+        self.prefetch_depth = look_ahead - 1
+        if self.prefetch_depth:
+            self.prefetch_base = Signal(xlen, name="prefetch_base", reset=0x200)
+            self.prefetch_count = Signal(range(self.prefetch_depth + 1), name="prefetch_count")
+            self.prefetch_data = [Signal(32, name=f"prefetch_data{i}") for i in range(self.prefetch_depth)]
+            # if set, value on mem2core is instruction, otherwise it's data requested by load
+            self.bus_is_fetch = Signal(name="bus_is_fetch", reset=1)
         
 
 
@@ -103,30 +150,41 @@ class Core(ElaboratableAbstract):
     def elaborate(self, p:Platform) -> Module:
         m = Module()
         self.current_module = m
-        m.submodules.alu = self.alu
-        m.submodules.shl = self.left_shifter
-        m.submodules.shr = self.right_shifter
-        m.submodules.regs = self.register_file
+        self.add_submodules(m)
         self.iclk = m.d.i
 
         m.d.comb += self.last_instruction_valid.eq(self.cycle != 0)
         
 
-        with m.If((self.cycle == 0) & (self.mem2core.ready)):
-            m.d.comb += self.current_instruction.eq(self.mem2core.value)
+        if self.prefetch_depth:
+            # instruction at pc is either at the head of prefetch buffer or is being read by mem2core
+            bus_hit = self.bus_is_fetch & self.mem2core.ready & (self.mem2core.addr == self.pc)
+            instruction_ready = (self.cycle == 0) & ((self.prefetch_count != 0) | bus_hit)
+            instruction = Mux(self.prefetch_count != 0, self.prefetch_data[0], self.mem2core.value)
+        else:
+            instruction_ready = (self.cycle == 0) & (self.mem2core.ready)
+            instruction = self.mem2core.value
+
+        with m.If(instruction_ready):
+            m.d.comb += self.current_instruction.eq(instruction)
             m.d.comb += self.current_instruction_valid.eq(1)
         with m.Else():
             m.d.comb += self.current_instruction.eq(self.last_instruction)
             m.d.comb += self.current_instruction_valid.eq(0)
 
         m.d.comb += self.have_valid_instruction.eq(self.current_instruction_valid | self.last_instruction_valid)
+        started = self.current_instruction_valid & ~self.in_reset
+        if self.is_enabled is not None:
+            started = started & self.is_enabled
+        m.d.comb += self.instruction_started.eq(started)
 
         self.itype.elaborate(m.d.comb, self.current_instruction)
         self.utype.elaborate(m.d.comb, self.current_instruction)
         self.btype.elaborate(m.d.comb, self.current_instruction)
         self.jtype.elaborate(m.d.comb, self.current_instruction)
         
-        m.d.comb += self.alu.en.eq(0)
+        if self.alu is not None:
+            m.d.comb += self.alu.en.eq(0)
         m.d.comb += self.advance_pc.eq(0)
         m.d.comb += self.next_pc.eq(0)
         
@@ -141,6 +199,21 @@ class Core(ElaboratableAbstract):
         self.iclk += self.last_instruction.eq(self.current_instruction)
         return m
 
+    def add_submodules(self, m : Module):
+        if self.alu is not None:
+            m.submodules.alu = self.alu
+        if self.left_shifter is not None:
+            m.submodules.shl = self.left_shifter
+            m.submodules.shr = self.right_shifter
+        elif self.shifter is not None:
+            m.submodules.sh = self.shifter
+        m.submodules.regs = self.register_file
+        if self.address_adder is not None:
+            m.submodules.address_adder = self.address_adder
+
+    def require_unit(self, unit : str):
+        assert unit in self.units, f"{unit} is called, but core is built without it (units={sorted(self.units)})"
+
     def query_rs1(self, idx=None):
         """ Query register file throught RS1 port. If no index provided, rs1 from the current instruction is used """
         if idx is None:
@@ -163,6 +236,11 @@ class Core(ElaboratableAbstract):
         iclk = self.iclk
         self.emit_debug_opcode(DebugOpcode.NOT_SPECIFIED, 0)
 
+        if self.prefetch_depth:
+            # prefetch goes first: reads scheduled by loads and reset override it
+            with m.If(~self.in_reset):
+                self.elaborate_prefetch()
+
         with m.If(self.in_reset):
             iclk += self.in_reset.eq(0)
             iclk += self.pc.eq(0x200)  
@@ -170,24 +248,133 @@ class Core(ElaboratableAbstract):
             self.emit_debug_opcode(DebugOpcode.IN_RESET)     
         with m.Elif(self.have_valid_instruction):
             # Run instruction if data is ready
-            first = True            
-            for instr in self.instructions:
-                if_inst = m.If if first else m.Elif
-                with if_inst(instr.check()):
-                    instr.implement()
-                first = False
-            with m.Else():
-                self.emit_debug_opcode(DebugOpcode.INVALID)
-                self.move_pc_to_next_instr()
-                #TODO: add reg instruction_executed and check it instead?
+            if self.dispatch == "switch":
+                self.elaborate_switch_dispatch()
+            else:
+                self.elaborate_priority_dispatch(self.instructions)
         with m.Else():
-            self.mem2core.init_read(self.iclk, self.pc, 1)
+            if not self.prefetch_depth:
+                self.mem2core.init_read(self.iclk, self.pc, 1)
             self.emit_debug_opcode(DebugOpcode.AWAIT_READ)
  
         return m
 
+    def elaborate_priority_dispatch(self, instructions : List[Instruction]):
+        """ Select instruction by if/elif chain over check() """
+        m = self.current_module
+        first = True
+        for instr in instructions:
+            if_inst = m.If if first else m.Elif
+            with if_inst(instr.check()):
+                instr.implement()
+            first = False
+        if first:
+            self.elaborate_invalid_instruction()
+        else:
+            with m.Else():
+                self.elaborate_invalid_instruction()
+
+    def elaborate_switch_dispatch(self):
+        """ Select instruction by flat switch over opcode and funct3 using Instruction.dispatch_keys().
+            Instructions without keys are checked by priority chain when no key matched """
+        m = self.current_module
+        unkeyed = []
+        with m.Switch(Cat(self.itype.opcode, self.itype.funct3)):
+            for instr in self.instructions:
+                keys = instr.dispatch_keys()
+                if keys is None:
+                    unkeyed.append(instr)
+                    continue
+                with m.Case(*[self.dispatch_pattern(opcode, funct3) for opcode, funct3 in keys]):
+                    instr.implement()
+            with m.Default():
+                self.elaborate_priority_dispatch(unkeyed)
+
+    @staticmethod
+    def dispatch_pattern(opcode : int, funct3 : Union[int, str, None]) -> str:
+        """ Pattern for Cat(opcode, funct3) """
+        if funct3 is None:
+            funct3 = "---"
+        elif isinstance(funct3, int):
+            funct3 = f"{funct3:03b}"
+        return f"{funct3}{opcode:07b}"
+
+    def elaborate_invalid_instruction(self):
+        self.emit_debug_opcode(DebugOpcode.INVALID)
+        self.move_pc_to_next_instr()
+        #TODO: add reg instruction_executed and check it instead?
+
+    def elaborate_prefetch(self):
+        """ Keep prefetch buffer filled with instructions that follow pc.
+
+            Buffer is consumed when instruction starts, so prefetch_base is pc+4 while instruction runs.
+            Reads are issued with seq hint as long as buffer has free space, on multi-lane
+            mem2core they are bursts and every valid lane that fits goes to the buffer.
+            If pc is redirected anywhere but pc+4, buffer is flushed and filling starts from the new pc.
+        """
+        m = self.current_module
+        comb = m.d.comb
+        iclk = self.iclk
+        bus = self.mem2core
+        xlen = self.xlen
+        depth = self.prefetch_depth
+        base, count, data = self.prefetch_base, self.prefetch_count, self.prefetch_data
+
+        popped = Signal(name="prefetch_popped")
+        count_after_pop = Signal.like(count, name="prefetch_count_after_pop")
+        consumed = Signal(name="prefetch_consumed")
+        response = Signal(name="prefetch_response")
+        accepted = Signal(bus.lanes, name="prefetch_accepted")
+        redirect = Signal(name="prefetch_redirect")
+        next_base = Signal(xlen, name="prefetch_next_base")
+        next_count = Signal.like(count, name="prefetch_next_count")
+
+        # next word to put into the buffer; the same address before and after pop
+        fill_addr = (base + (count << 2))[:xlen]
+        comb += popped.eq(self.current_instruction_valid & (count != 0))
+        comb += count_after_pop.eq(count - popped)
+        # if instruction was taken directly from the bus, its lane is not put into the buffer
+        comb += consumed.eq(self.current_instruction_valid & (count == 0))
+        comb += response.eq(self.bus_is_fetch & bus.ready & (bus.addr == fill_addr))
+        comb += redirect.eq(self.advance_pc & (self.next_pc != (self.pc + 4)[:xlen]))
+
+        # lane j goes to slot count_after_pop + j - consumed
+        slots = [count_after_pop] + [count_after_pop + j - consumed for j in range(1, bus.lanes)]
+        for j in range(bus.lanes):
+            lane_valid = bus.valid[j] if bus.valid is not None else 1
+            lane_fits = slots[j] < depth
+            if j == 0:
+                lane_fits = lane_fits & ~consumed
+            comb += accepted[j].eq(response & lane_valid & lane_fits)
+
+        for i in range(depth):
+            first = True
+            for j in range(bus.lanes):
+                if_lane = m.If if first else m.Elif
+                with if_lane(accepted[j] & (slots[j] == i)):
+                    iclk += data[i].eq(bus.values[j])
+                first = False
+            if i + 1 < depth:
+                with m.Elif(popped):
+                    iclk += data[i].eq(data[i + 1])
+
+        with m.If(redirect):
+            comb += next_base.eq(self.next_pc)
+            comb += next_count.eq(0)
+        with m.Else():
+            comb += next_base.eq(Mux(self.current_instruction_valid, (base + 4)[:xlen], base))
+            comb += next_count.eq(count_after_pop + sum(accepted[j] for j in range(bus.lanes)))
+        iclk += base.eq(next_base)
+        iclk += count.eq(next_count)
+
+        # Don't touch the bus while it still waits for data for load
+        with m.If((self.bus_is_fetch | bus.ready) & (next_count != depth)):
+            bus.init_read(iclk, (next_base + (next_count << 2))[:xlen], 1, bus.lanes)
+            iclk += self.bus_is_fetch.eq(1)
+
     def call_alu(self, func : OpAlu, lhs : Statement, rhs : Statement): 
         """ Call ALU and return its output wire """
+        self.require_unit("alu")
         comb = self.current_module.d.comb 
 
         comb += self.alu.lhs.eq(lhs)
@@ -198,21 +385,47 @@ class Core(ElaboratableAbstract):
         return self.alu.output
 
         
+    def call_address_adder(self, lhs : Value, rhs : Value) -> Value:
+        """ Return lhs + rhs truncated to xlen. Used for load, jump and branch addresses """
+        self.require_unit("address_adder")
+        if self.address_adder is None:
+            return (lhs + rhs)[:self.xlen]
+        comb = self.current_module.d.comb
+        comb += self.address_adder.x.eq(lhs)
+        comb += self.address_adder.y.eq(rhs)
+        comb += self.address_adder.carry0.eq(0)
+        return self.address_adder.out[:self.xlen]
+
     def call_left_shift(self, rs: Value, shamt : Statement):
         """ Call SHIFT-LEFT module and return its output wire """
+        self.require_unit("shifter")
         comb = self.current_module.d.comb         
+        if self.shifter is not None:
+            comb += self.shifter.left.eq(1)
+            return self.call_unified_shift(rs, shamt, 0)
         comb += self.left_shifter.input.eq(rs)
         comb += self.left_shifter.shamt.eq(shamt)
         return self.left_shifter.output
 
     def call_right_shift(self, rs: Value, shamt : Statement, msb : Statement):
         """ Call SHIFT-RIGHT module and return its output wire """
+        self.require_unit("shifter")
         comb = self.current_module.d.comb 
+        if self.shifter is not None:
+            comb += self.shifter.left.eq(0)
+            return self.call_unified_shift(rs, shamt, msb)
         comb += self.right_shifter.input.eq(rs)
         comb += self.right_shifter.msb.eq(msb)
         comb += self.right_shifter.shamt.eq(shamt)
         return self.right_shifter.output
 
+    def call_unified_shift(self, rs: Value, shamt : Statement, msb : Statement):
+        comb = self.current_module.d.comb
+        comb += self.shifter.input.eq(rs)
+        comb += self.shifter.msb.eq(msb)
+        comb += self.shifter.shamt.eq(shamt)
+        return self.shifter.output
+
 
     def emit_debug_opcode(self, op:DebugOpcode, x : Optional[Value] = None):
         if self.debug_opcode is not None:
@@ -240,43 +453,153 @@ class Core(ElaboratableAbstract):
         m = self.current_module
         with m.If(self.advance_pc):
             self.iclk += self.pc.eq(self.next_pc)
-            self.schedule_read(self.next_pc, 1)
+            if not self.prefetch_depth:
+                self.schedule_read(self.next_pc, 1)
             self.iclk += self.cycle.eq(0)            
 
     def schedule_read(self, addr, seq):
         self.mem2core.init_read(self.iclk, addr, seq)
-
-    def make_fakemem(self, m : Module, mem : Dict[int, int]):
-        comb : List[Statement] = m.d.comb
-        with m.If(self.mem2core.en):
-            with m.Switch(self.mem2core.addr):
-                for address, value in mem.items():
-                    with m.Case(address):
-                        word_value = value | (mem.get(address+1, 0xff) << 8) | (mem.get(address+2, 0xff) << 16) | (mem.get(address+3, 0xff) << 24)
-                        comb += self.mem2core.value.eq(word_value)
-                with m.Default():
-                    comb += self.mem2core.value.eq(0xFFFFFFFF) 
-            comb += self.mem2core.ready.eq(1)
-        with m.Else():
-            comb += self.mem2core.ready.eq(1)
-                
-
-    def simulate(self, top : Module, clk : ClockInfo, mem : Dict[int, int], n=30, filename_prefix="waves/test"):
+        if self.prefetch_depth:
+            self.iclk += self.bus_is_fetch.eq(0)
+
+    def max_cycles(self) -> int:
+        return max([instr.cycles() for instr in self.instructions], default=1)
+
+    def invariants(self) -> List[Value]:
+        """ Properties of every reachable state. BMC doesn't need them, but k-induction starts
+            from arbitrary state and without them finds counterexamples that can't happen:
+            * cycle only counts cycles of multi-cycle instructions
+            * nothing runs and prefetch doesn't start until reset is over
+            * last_instruction is kept only for multi-cycle instruction in progress """
+        multi_cycle = Cat(*[instr.check() for instr in self.instructions if instr.cycles() > 1])
+        result = [
+            self.cycle < self.max_cycles(),
+            self.in_reset.implies(~self.last_instruction_valid),
+            # current_instruction is last_instruction while it's valid, so check() decodes it
+            self.last_instruction_valid.implies(multi_cycle.any()),
+        ]
+        if self.prefetch_depth:
+            result.append(self.in_reset.implies((self.prefetch_count == 0) & self.bus_is_fetch))
+        return result
+
+    def assert_invariants(self, m : Module):
+        for invariant in self.invariants():
+            m.d.comb += Assert(invariant)
+
+    def attach_cache(self, m : Module, name : str, cacheable, size=256, line=16, ways=1) -> ReadCache:
+        """ Put ReadCache between memory_bus and new downstream bus that becomes memory_bus """
+        downstream = MemoryBus(self.addr_length, self.xlen, f"{name}_mem", lanes=self.mem2core.lanes)
+        cache = ReadCache(self.memory_bus, downstream, size, line, ways, cacheable=cacheable, prefix=name, domain=self.clock.domain.name)
+        m.submodules[name] = cache
+        self.caches.append(cache)
+        counters = [cache.hits, cache.misses]
+        if self.debug_opcode is not None:
+            # hit/miss statistics go to debug outputs of the core
+            for counter in counters:
+                debug_counter = self.add_output_signal(len(counter), name=f"dbg_{counter.name}")
+                m.d.comb += debug_counter.eq(counter)
+        known = {id(port) for port in self.ports() + counters}
+        self.aux_ports.extend(port for port in cache.ports() if id(port) not in known)
+        self.memory_bus = downstream
+        return cache
+
+    def attach_icache(self, m : Module, size=256, line=16, ways=1) -> ReadCache:
+        """ Cache instruction fetches, i.e. requests with seq hint """
+        return self.attach_cache(m, "icache", lambda bus: bus.seq, size, line, ways)
+
+    def attach_dcache(self, m : Module, size=256, line=16, ways=1) -> ReadCache:
+        """ Cache loads, i.e. requests without seq hint. Loads that are not word-aligned are not cached """
+        return self.attach_cache(m, "dcache", lambda bus: ~bus.seq, size, line, ways)
+
+    def make_fakemem(self, m : Module, mem : Dict[int, int], latency=0):
+        """ Attach read-only memory initialized from MemBuild dictionary to memory_bus """
+        m.submodules.fakemem = FakeMemory(self.memory_bus, mem, self.xlen, latency=latency)
+
+    def simulate(self, top : Module, clk : ClockInfo, mem : Dict[int, int], n=30, filename_prefix="waves/test",
+            halt_pc : Optional[int] = None, halt_on_ebreak=False, halt_invalid_streak : Optional[int] = None,
+            trace : Union[str, List[Signal], None] = "all", trace_window : Optional[Tuple[int, int]] = None,
+            mem_latency=0) -> 'SimulationStats':
+        """ Simulate core over memory `mem`.
+            Without halt conditions exactly n cycles are simulated, otherwise n is the upper limit.
+            halt_pc - stop when pc reaches the address (instruction at halt_pc is not executed)
+            halt_on_ebreak - stop when EBREAK is reached (core treats it as invalid instruction)
+            halt_invalid_streak - stop after that many consecutive cycles reported DebugOpcode.INVALID
+            trace - "all" dumps all ports of the core to VCD/GTKW, None skips writing waves,
+                list samples only these signals once per cycle (see CycleTrace)
+            trace_window - (first, last) cycles to sample. Simulation outside of the window runs without tracing
+            mem_latency - cycles memory needs to serve a read (see FakeMemory)
+        """
         rst = clk.rst
-        self.make_fakemem(top, mem)
+        self.make_fakemem(top, mem, mem_latency)
         dump_inputs(self, top)
-
-        def timings():            
+        stats = SimulationStats()
+        cycle_trace = None
+        if trace == "all" and trace_window is not None:
+            trace = [port for port in self.ports() if isinstance(port, Signal)]
+        if trace and trace != "all":
+            cycle_trace = CycleTrace(trace, f"{filename_prefix}.vcd", f"{filename_prefix}.gtkw", trace_window)
+        ebreak = IType.build_i32(opcode=Opcode.System, imm=OpSystem.EBREAK)
+
+        def run_cycles():
+            invalid_streak = 0
+            for _ in range(n):
+                yield
+                yield Settle()
+                stats.cycles += 1
+                if cycle_trace is not None:
+                    yield from cycle_trace.sample(stats.cycles)
+                pc = yield self.pc
+                if halt_pc is not None and pc == halt_pc and (yield self.cycle) == 0 and not (yield self.in_reset):
+                    stats.halt_reason = f"pc={pc:#x}"
+                    return
+                is_invalid = self.debug_opcode is not None and (yield self.debug_opcode) == DebugOpcode.INVALID
+                if is_invalid and halt_on_ebreak and (yield self.current_instruction) == ebreak:
+                    stats.halt_reason = f"ebreak at pc={pc:#x}"
+                    return
+                invalid_streak = invalid_streak + 1 if is_invalid else 0
+                if halt_invalid_streak is not None and invalid_streak >= halt_invalid_streak:
+                    stats.halt_reason = f"{invalid_streak} invalid instructions at pc={pc:#x}"
+                    return
+                if (yield self.advance_pc):
+                    stats.retired += 1
+
+        def timings():
             yield rst.eq(1)
             yield
             yield rst.eq(0)
-            for _ in range(n):
-                yield
+            yield from run_cycles()
+            for cache in self.caches:
+                stats.caches[cache.prefix] = ((yield cache.hits), (yield cache.misses))
 
         sim = Simulator(top)
         sim.add_clock(muS, domain="i")
         sim.add_sync_process(timings, domain="i")
-        with sim.write_vcd(f"{filename_prefix}.vcd", f"{filename_prefix}.gtkw",  traces = self.ports()):
+        if trace == "all" and trace_window is None:
+            with sim.write_vcd(f"{filename_prefix}.vcd", f"{filename_prefix}.gtkw",  traces = self.ports()):
+                sim.run()
+        else:
             sim.run()
-        
-        
+        if cycle_trace is not None:
+            cycle_trace.close()
+        return stats
+
+
+class SimulationStats:
+    """ Counters collected by Core.simulate """
+    def __init__(self):
+        # clock cycles after reset was released
+        self.cycles = 0
+        # instructions that moved pc (invalid instructions included, as they are skipped)
+        self.retired = 0
+        # None if simulation ran for all n cycles
+        self.halt_reason : Optional[str] = None
+        # cache name -> (hits, misses)
+        self.caches : Dict[str, Tuple[int, int]] = {}
+
+    def cpi(self) -> float:
+        return self.cycles / self.retired if self.retired else float("inf")
+
+    def __repr__(self):
+        halt = f"halted: {self.halt_reason}" if self.halt_reason else "not halted"
+        caches = "".join(f" {name}: hits={hits} misses={misses}" for name, (hits, misses) in self.caches.items())
+        return f"cycles={self.cycles} retired={self.retired} cpi={self.cpi():.2f} {halt}{caches}"
@@ -0,0 +1,91 @@
+""" Benchmarks of dottod on a real netlist.
+
+    Input is a dot file of the flattened core, e.g. from `make bench-dottod` or rv.dot of ltp.py.
+    It's first rewritten by Graph.write_dot, so both parsers read the dump format dottod produces.
+
+        python3 -m dottod.benchmark rv.dot
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+
+from dottod.dottod import Graph, DotWriter, is_produced_wire, remove_unused_produced_wires
+
+
+def dump(g : Graph) -> str:
+    f = io.StringIO()
+    DotWriter(g, f).print()
+    return f.getvalue()
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def read_graph(fname, streaming) -> Graph:
+    g = Graph()
+    g.read_dot(fname, streaming=streaming)
+    return g
+
+def bench_parse(fname):
+    char_graph, char_time = timed(lambda: read_graph(fname, streaming=False))
+    stream_graph, stream_time = timed(lambda: read_graph(fname, streaming=True))
+    assert dump(char_graph) == dump(stream_graph), "parsers built different graphs"
+    print(f"parse {len(stream_graph.nodes)} nodes, {len(stream_graph.connections)} connections")
+    print(f"  DotParser          {char_time:8.3f}s")
+    print(f"  StreamingDotParser {stream_time:8.3f}s  x{char_time / stream_time:.1f}")
+
+
+def remove_unused_produced_wires_by_layers(g : Graph):
+    """ Reference: rescan the graph and delete one layer of unused wires per pass """
+    while True:
+        nodes = g.select_nodes(lambda n: not n.outputs and is_produced_wire(n))
+        if not nodes:
+            break
+        for node in nodes:
+            g.delete_node(node)
+
+def bench_remove_unused(fname):
+    layered_graph = read_graph(fname, streaming=True)
+    worklist_graph = read_graph(fname, streaming=True)
+    _, layered_time = timed(lambda: remove_unused_produced_wires_by_layers(layered_graph))
+    _, worklist_time = timed(lambda: remove_unused_produced_wires(worklist_graph))
+    assert dump(layered_graph) == dump(worklist_graph), "dead wire elimination results differ"
+    print(f"remove_unused_produced_wires: {len(worklist_graph.nodes)} nodes left")
+    print(f"  by layers          {layered_time:8.3f}s")
+    print(f"  worklist           {worklist_time:8.3f}s  x{layered_time / worklist_time:.1f}")
+
+
+def bench_json(dot_fname, json_fname):
+    dot_graph, dot_time = timed(lambda: read_graph(dot_fname, streaming=True))
+    def read_json():
+        g = Graph()
+        g.read_json(json_fname)
+        return g
+    json_graph, json_time = timed(read_json)
+    print(f"load: dot {len(dot_graph.nodes)} nodes, json {len(json_graph.nodes)} nodes")
+    print(f"  read_dot           {dot_time:8.3f}s")
+    print(f"  read_json          {json_time:8.3f}s  x{dot_time / json_time:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="dottod benchmarks")
+    parser.add_argument("dot", type=str, help="dot file of the netlist")
+    parser.add_argument("--json", type=str, metavar="FILE", help="yosys write_json netlist of the same design, compare loading")
+    args = parser.parse_args()
+
+    g = Graph()
+    g.read_dot(args.dot)
+    with tempfile.TemporaryDirectory() as tmp:
+        fname = os.path.join(tmp, "dump.dot")
+        g.write_dot(fname)
+        print(f"{args.dot}: {os.path.getsize(fname) / 1e6:.1f} MB after write_dot")
+        bench_parse(fname)
+        bench_remove_unused(fname)
+    if args.json:
+        bench_json(args.dot, args.json)
+
+if __name__ == "__main__":
+    main()
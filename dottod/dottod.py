@@ -1,4 +1,39 @@
-from typing import Dict, List, Callable, Union, Set
+import gc
+import heapq
+import json
+import re
+from contextlib import contextmanager
+from typing import Dict, List, Callable, Union, Set, Iterable, Optional, Tuple
+
+class OrderedSet:
+    """ Insertion-ordered set with list-like append/remove, both O(1) """
+    def __init__(self, items : Iterable = ()):
+        self.items = dict.fromkeys(items)
+
+    def add(self, item):
+        self.items[item] = None
+    append = add
+
+    def remove(self, item):
+        del self.items[item]
+
+    def discard(self, item):
+        self.items.pop(item, None)
+
+    def __contains__(self, item):
+        return item in self.items
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def __repr__(self):
+        return f"OrderedSet({list(self.items)})"
 
 class Connection:
     def __init__(self, node_name_from, node_name_to):
@@ -10,6 +45,8 @@ class Connection:
         self.properties_map={}
         self.properties_list=[]
         self.graph = None
+        # structured data that is not written to dot, e.g. port and width of netlist loaders
+        self.attributes : Dict[str, object] = {}
     def set_property(self, id, value):
         if id in self.properties_map:
             self.properties_map[id] = value
@@ -37,10 +74,18 @@ class Node:
         self.outputs : Dict[str, Connection] = {}
         self.properties_map={}
         self.properties_list=[]
+        # set by Graph.add_node, graph keeps its label index up to date
+        self.graph = None
+        # structured data that is not written to dot, e.g. cell type of netlist loaders
+        self.attributes : Dict[str, object] = {}
 
     def add_property(self, property, value):
+        if property == "label" and self.graph is not None:
+            self.graph.unindex_label(self)
         self.properties_map[property] = value
         self.properties_list.append(property)
+        if property == "label" and self.graph is not None:
+            self.graph.index_label(self)
 
     def __repr__(self):
         res = f"(node {self.id}"
@@ -50,10 +95,14 @@ class Node:
         return res
 
     def set_property(self, id, value):
-        if id in self.properties_map:
+        if id not in self.properties_map:
+            self.add_property(id, value)
+        elif id == "label" and self.graph is not None:
+            self.graph.unindex_label(self)
             self.properties_map[id] = value
+            self.graph.index_label(self)
         else:
-            self.add_property(id, value)
+            self.properties_map[id] = value
     def get_property(self, id, default=""):
         return self.properties_map.get(id,default)
 
@@ -62,6 +111,27 @@ class Node:
     def label(self):
         return self.get_property("label")
 
+    # yosys show draws cells as records: {{<p1> A|<p2> B}|$123\n$add|{<p3> Y}}
+    CELL_LABEL_RE = re.compile(r'\}\|([^|{}]*)\\n([^|{}]*)\|\{')
+
+    def cell_type(self) -> Optional[str]:
+        """ Type of the cell ($add, $dff, ...) or None if node is a wire """
+        if "type" in self.attributes:
+            return self.attributes["type"]
+        match = self.CELL_LABEL_RE.search(self.label())
+        return match.group(2) if match else None
+
+    def signal_name(self) -> str:
+        """ Wire name or `cell type` of the node, without dot quoting """
+        if "name" in self.attributes:
+            if "type" in self.attributes:
+                return f"{self.attributes['name']} {self.attributes['type']}"
+            return self.attributes["name"]
+        match = self.CELL_LABEL_RE.search(self.label())
+        if match:
+            return f"{match.group(1)} {match.group(2)}"
+        return self.label().strip('"')
+
 
 class DotParser:
     def __init__(self, lines, graph):
@@ -304,17 +374,346 @@ class DotParser:
 
 
 
+class StreamingDotParser(DotParser):
+    """ DotParser that splits the whole text into tokens with one regex instead of walking it char by char.
+
+        Tokens are the same as DotParser.read_next_token returns, so the same Graph is built.
+        Body is parsed statement by statement straight from the token list.
+        Position is an index in the token list, line:col is recovered only for error messages.
+    """
+    # ids and strings go first as they are most of the tokens, last \S catches what DotParser can't read
+    TOKEN_RE = re.compile(r'[^\W_]+|"[^"\\\n]*(?:\\.[^"\\\n]*)*"|->|[{}\[\]()<>;,:=]|\S')
+    PUNCTUATION = set("{}[]()<>;,:=")
+
+    def __init__(self, text, graph):
+        self.text = text
+        tokens = self.TOKEN_RE.findall(text)
+        for token in set(tokens):
+            if len(token) == 1 and token not in self.PUNCTUATION and not token.isalnum():
+                self.pos = tokens.index(token)
+                raise Exception(f"Unknown token start `{token}` around {self.location()}")
+        self.count = len(tokens)
+        # statements look a few tokens ahead, end of text reads as None like in DotParser
+        self.tokens = tokens + [None] * 4
+        self.pos = 0
+        self.graph = graph
+
+    def read_next_token(self) -> str:
+        if self.pos >= self.count:
+            return None
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def remember_pos(self):
+        return self.pos
+    def restore_pos(self, remembered_pos):
+        self.pos = remembered_pos
+
+    def read_body(self):
+        tokens = self.tokens
+        graph = self.graph
+        i = self.pos
+        while True:
+            id = tokens[i]
+            if not id or id == '}':
+                self.pos = i + 1
+                return
+            op = tokens[i+1]
+
+            if op == '[':
+                self.pos = i
+                assert id not in graph.nodes
+                node = Node(id)
+                # properties go first, so node is put into label index once
+                i = self.read_properties_at(i + 2, node)
+                graph.add_node(node)
+                assert tokens[i] == ';'
+                i += 1
+                continue
+
+            if op != ':' and op != '->':
+                self.pos = i
+                assert False, f"unexpected node-token {op} around {self.location()}"
+            i, from_path = self.read_node_path_at(i)
+            self.pos = i
+            assert tokens[i] == "->", f"got {tokens[i]}, expect connection around {self.location()}"
+            i, to_path = self.read_node_path_at(i + 1)
+            connection = Connection(from_path[0], to_path[0])
+            connection.node_path_from = from_path
+            connection.node_path_to = to_path
+            if tokens[i] == '[':
+                i = self.read_properties_at(i + 1, connection)
+            graph.defer_connection(connection)
+            assert tokens[i] == ';'
+            i += 1
+
+    def read_node_path_at(self, i):
+        """ Read a:b:c starting at token i, return index after it and the path """
+        tokens = self.tokens
+        node_path = []
+        while True:
+            sub_node = tokens[i]
+            if not sub_node or not sub_node.isalnum():
+                self.pos = i
+                assert False, f"got {sub_node}, but expected path around {self.location()}"
+            node_path.append(sub_node)
+            if tokens[i+1] != ':':
+                return i + 1, node_path
+            i += 2
+
+    def read_properties_at(self, i, obj):
+        """ Read properties after `[` at token i, return index after `]` """
+        tokens = self.tokens
+        while True:
+            prop = tokens[i]
+            self.pos = i
+            assert prop, f"properties not terminated around {self.location()}"
+            if prop == ']':
+                return i + 1
+            assert prop.isalnum(), f"invalid prop id {prop} around {self.location()}"
+            assert tokens[i+1] == '=', f"expected {prop}=<value> around {self.location()}"
+            obj.add_property(prop, tokens[i+2])
+            next = tokens[i+3]
+            i += 4
+            if next == ']':
+                return i
+            if next != ',':
+                self.pos = i - 1
+                assert False, f"unexpected token {next} around {self.location()}, expect COMMA(next prop) or RCURLY(end of list)"
+
+    def location(self)->str:
+        offset = len(self.text)
+        for i, match in enumerate(self.TOKEN_RE.finditer(self.text)):
+            if i == self.pos:
+                offset = match.start()
+                break
+        line = self.text.count("\n", 0, offset)
+        col = offset - (self.text.rfind("\n", 0, offset) + 1)
+        return f"{line+1}:{1+col}"
+
+
+class YosysJsonLoader:
+    """ Build graph of one module of yosys `write_json` netlist the way `show` draws it.
+
+        Every cell is a node, every net (netname that owns some bits) is a node.
+        Cell input ports are connected from nets that drive their bits, output ports to nets they drive.
+        Of netnames sharing the same bits the visible one owns them, so aliases don't produce BUF nodes.
+        Constant bits are not drawn.
+
+        Node attributes:
+          cells - name, type, parameters, ports (port -> direction), widths (port -> bits)
+          nets  - name, width, hidden, direction (for module ports)
+        Connection attributes: ports of the cell and width (number of bits)
+        Labels are the same as in `show` output, so dot-based heuristics work on loaded graphs.
+    """
+    def __init__(self, netlist : dict, graph, top : Optional[str] = None):
+        self.netlist = netlist
+        self.graph = graph
+        self.top = top
+
+    def find_top(self) -> str:
+        modules = self.netlist["modules"]
+        if self.top is not None:
+            assert self.top in modules, f"module {self.top} is not in the netlist"
+            return self.top
+        tops = [name for name, module in modules.items() if int(module.get("attributes", {}).get("top", "0"), 2)]
+        if len(tops) == 1:
+            return tops[0]
+        assert len(modules) == 1, f"can't choose top module among {list(modules)}, pass it explicitly"
+        return next(iter(modules))
+
+    def read(self):
+        g = self.graph
+        g.make_directional_graph()
+        g.name = f'"{self.find_top()}"'
+        module = self.netlist["modules"][self.find_top()]
+        g.add_property("rankdir", '"LR"')
+
+        port_directions = {name: port["direction"] for name, port in module.get("ports", {}).items()}
+        # visible names own bits before hidden ones, ports before other visible names
+        netnames = sorted(module.get("netnames", {}).items(),
+            key=lambda item: (item[1].get("hide_name", 0), item[0] not in port_directions))
+        # constant bits are owned by no node
+        bit_owner : Dict[object, Optional[str]] = dict.fromkeys(("0", "1", "x", "z"))
+        # bits of a cell port -> (net, number of its bits) pairs. Most ports are exactly one net,
+        # buses feed many ports, so nets of a port are looked up once per distinct list of bits
+        port_nets : Dict[tuple, Tuple[Tuple[str, int], ...]] = {}
+        for name, net in netnames:
+            bits = net["bits"]
+            owns = [bit for bit in bits if bit not in bit_owner]
+            if not owns:
+                continue
+            node = Node(f"n{len(g.nodes)}")
+            for bit in owns:
+                bit_owner[bit] = node.id
+            if len(owns) == len(bits):
+                port_nets[tuple(bits)] = ((node.id, len(bits)),)
+            display = name[1:] if name.startswith("\\") else name
+            hidden = bool(net.get("hide_name", 0))
+            is_port = name in port_directions
+            node.attributes = {"name": display, "width": len(bits), "hidden": hidden}
+            if is_port:
+                node.attributes["direction"] = port_directions[name]
+            # properties are set directly: they go before add_node, so label index isn't touched
+            node.properties_map = {"shape": "octagon" if is_port else "diamond", "label": quote(display),
+                "color": '"black"', "fontcolor": '"black"'}
+            node.properties_list = list(node.properties_map)
+            g.add_node(node)
+
+        # cells share few port names and types, their record parts are built once
+        port_records : Dict[Tuple[int, str], str] = {}
+        type_records : Dict[str, str] = {}
+        owner_of = bit_owner.get
+        defer_connection = g.defer_connection
+        add_node = g.add_node
+        for name, cell in module.get("cells", {}).items():
+            node_id = f"c{len(g.nodes)}"
+            node = Node(node_id)
+            display = name[1:] if name.startswith("\\") else name
+            cell_type = cell["type"]
+            directions = cell.get("port_directions", {})
+            connections = cell.get("connections", {})
+            node.attributes = {"name": display, "type": cell_type, "parameters": cell.get("parameters", {}),
+                "ports": directions, "widths": {port: len(bits) for port, bits in connections.items()}}
+            input_ports = []
+            output_ports = []
+            # Graph keeps one connection per pair of nodes, net feeding several ports is one connection
+            cell_connections : Dict[str, Connection] = {}
+            for i, (port, bits) in enumerate(connections.items()):
+                record = port_records.get((i, port))
+                if record is None:
+                    record = port_records[(i, port)] = f"<p{i}> {record_escape(port)}"
+                is_input = directions.get(port, "input") == "input"
+                (input_ports if is_input else output_ports).append(record)
+
+                key = tuple(bits)
+                nets = port_nets.get(key)
+                if nets is None:
+                    widths : Dict[str, int] = {}
+                    for net_id in map(owner_of, key):
+                        if net_id is not None:
+                            widths[net_id] = widths.get(net_id, 0) + 1
+                    nets = port_nets[key] = tuple(widths.items())
+                for net_id, width in nets:
+                    connection = cell_connections.get(net_id)
+                    if connection is not None:
+                        connection.attributes["ports"].append(port)
+                        connection.attributes["width"] += width
+                        continue
+                    if is_input:
+                        connection = Connection(net_id, node_id)
+                        connection.node_path_to = [node_id, f"p{i}"]
+                    else:
+                        connection = Connection(node_id, net_id)
+                        connection.node_path_from = [node_id, f"p{i}"]
+                    connection.attributes = {"ports": [port], "width": width}
+                    cell_connections[net_id] = connection
+                    defer_connection(connection)
+
+            type_record = type_records.get(cell_type)
+            if type_record is None:
+                type_record = type_records[cell_type] = escape(record_escape(cell_type))
+            node.properties_map = {"shape": "record", "label": '"{{%s}|%s\\n%s|{%s}}"' % ("|".join(input_ports),
+                escape(record_escape(display)), type_record, "|".join(output_ports))}
+            node.properties_list = list(node.properties_map)
+            add_node(node)
+        g.propogate_connections()
+
+
+def escape(text : str) -> str:
+    return text.replace("\\", "\\\\").replace('"', '\\"')
+
+def quote(text : str) -> str:
+    return f'"{escape(text)}"'
+
+RECORD_ESCAPES = {ord(c): "\\" + c for c in "{}|<> "}
+
+def record_escape(text : str) -> str:
+    return text.translate(RECORD_ESCAPES)
+
+@contextmanager
+def paused_gc():
+    """ Graphs are hundreds of thousands of small objects, cyclic GC would rescan them over and over while they are built """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+# Rough delays in gate levels. Arithmetic and comparisons are carry chains, shifts are log2(width) muxes.
+# Wires, buffers and unknown nodes cost nothing, unknown cells cost 1.
+DEFAULT_CELL_DELAYS : Dict[str, float] = {
+    "$not": 1, "$pos": 0, "$neg": 8,
+    "$and": 1, "$or": 1, "$xor": 1, "$xnor": 1,
+    "$logic_not": 1, "$logic_and": 1, "$logic_or": 1,
+    "$reduce_and": 2, "$reduce_or": 2, "$reduce_xor": 3, "$reduce_bool": 2,
+    "$mux": 1, "$pmux": 3, "$bmux": 3, "$demux": 2,
+    "$eq": 3, "$ne": 3, "$eqx": 3, "$nex": 3,
+    "$lt": 8, "$le": 8, "$gt": 8, "$ge": 8,
+    "$add": 8, "$sub": 8, "$alu": 8, "$mul": 16,
+    "$shl": 5, "$shr": 5, "$sshl": 5, "$sshr": 5, "$shift": 5, "$shiftx": 5,
+    "$memrd": 2,
+}
+
+# Cells that break combinational paths: inputs end a path, outputs start one
+SEQUENTIAL_CELLS = {
+    "$dff", "$dffe", "$adff", "$adffe", "$sdff", "$sdffe", "$sdffce", "$dffsr", "$dffsre",
+    "$aldff", "$aldffe", "$ff", "$dlatch", "$adlatch", "$dlatchsr",
+    "$mem", "$mem_v2", "$memwr", "$memwr_v2", "$memrd_v2",
+}
+
+def is_sequential_cell(cell_type : Optional[str]) -> bool:
+    return cell_type is not None and (cell_type in SEQUENTIAL_CELLS or cell_type.startswith("SB_DFF"))
+
+
+class TimingPath:
+    """ Combinational path found by Graph.longest_paths """
+    def __init__(self, delay : float, nodes : List[Node]):
+        self.delay = delay
+        self.nodes = nodes
+
+    def start(self) -> Node:
+        return self.nodes[0]
+
+    def end(self) -> Node:
+        return self.nodes[-1]
+
+    def __repr__(self):
+        return f"(path {self.delay} {self.start().signal_name()} -> {self.end().signal_name()})"
+
+    def to_json(self) -> dict:
+        return {
+            "delay": self.delay,
+            "start": self.start().signal_name(),
+            "end": self.end().signal_name(),
+            "nodes": [{"id": n.id, "signal": n.signal_name(), "type": n.cell_type()} for n in self.nodes],
+        }
+
+
 class Graph:
+    """ Directed graph read from dot.
+
+        Nodes and connections are kept in OrderedSets, so deletion is O(1) and output order is stable.
+        Nodes are also indexed by the first LABEL_PREFIX_LEN characters of the label (quote included),
+        select_nodes_by_label_prefix() looks only at nodes which can match.
+    """
+    LABEL_PREFIX_LEN = 4
+
     def __init__(self):
         self.nodes : Dict[str, Node] = {}
-        self.node_list = []
+        self.node_list = OrderedSet()
         self.name = ""
         self.is_directional = False
         self.properties_map={}
         self.properties_list=[]
         self.connect_later : List[Connection] = []
-        self.connections : List[Connection] = []
+        self.connections = OrderedSet()
         self.pinned_nodes : Set[str] = set()
+        self.label_index : Dict[str, OrderedSet] = {}
 
     def make_directional_graph(self):
         self.is_directional = True
@@ -331,6 +730,18 @@ class Graph:
         assert node.id
         self.nodes[node.id] = node
         self.node_list.append(node.id)
+        node.graph = self
+        self.index_label(node)
+
+    def index_label(self, node : Node):
+        key = node.label()[:self.LABEL_PREFIX_LEN]
+        if key not in self.label_index:
+            self.label_index[key] = OrderedSet()
+        self.label_index[key].add(node.id)
+
+    def unindex_label(self, node : Node):
+        key = node.label()[:self.LABEL_PREFIX_LEN]
+        self.label_index[key].discard(node.id)
 
     def propogate_connections(self):
         for c in self.connect_later:
@@ -347,11 +758,95 @@ class Graph:
         self.connect_later = []
         
 
-    def read_dot(self, fname):
-        dp = DotParser(open(fname).readlines(), self)
-        dp.read_prologue()
-        dp.read_body()
-        self.propogate_connections()
+    def node_delay(self, node : Node, delays : Dict[str, float]) -> float:
+        cell_type = node.cell_type()
+        if cell_type is None:
+            return 0
+        return delays.get(cell_type, 1)
+
+    def longest_paths(self, top_k=1, delays : Optional[Dict[str, float]] = None,
+            accept_end : Optional[Callable[[Node], bool]] = None) -> List[TimingPath]:
+        """ Return top_k slowest combinational paths, slowest first.
+
+            Delay of a path is the sum of node delays: `delays` by cell type on top of DEFAULT_CELL_DELAYS.
+            Paths start at nodes without inputs or at outputs of sequential cells, and end at nodes without
+            outputs or at inputs of sequential cells (sequential cell is the last node of such path).
+            Every node keeps top_k best arrivals with back pointers, so it's O((nodes + connections) * top_k).
+            Nodes on combinational loops can't be ordered and are skipped.
+            If accept_end is given, only paths that end in accepted nodes are reported.
+        """
+        table = dict(DEFAULT_CELL_DELAYS)
+        if delays:
+            table.update(delays)
+        sequential = {id for id, node in self.nodes.items() if is_sequential_cell(node.cell_type())}
+
+        # arrivals[id] = [(arrival, pred_id, pred_rank)], slowest first
+        arrivals : Dict[str, List[Tuple[float, Optional[str], int]]] = {}
+        pending = {id: (0 if id in sequential else len(node.inputs)) for id, node in self.nodes.items()}
+        ready = [id for id in self.node_list if pending[id] == 0]
+        while ready:
+            id = ready.pop()
+            node = self.nodes[id]
+            delay = self.node_delay(node, table)
+            if id in sequential or not node.inputs:
+                arrivals[id] = [(delay, None, 0)]
+            else:
+                arrivals[id] = self.best_arrivals(node, arrivals, delay, top_k)
+            for next_id in node.outputs:
+                if next_id in sequential:
+                    continue
+                pending[next_id] -= 1
+                if pending[next_id] == 0:
+                    ready.append(next_id)
+
+        # endpoint candidates: (arrival, end_id, rank, is_capture)
+        ends = []
+        captures = {}
+        for id, node in self.nodes.items():
+            if accept_end is not None and not accept_end(node):
+                continue
+            if id in sequential:
+                captures[id] = self.best_arrivals(node, arrivals, 0, top_k)
+                ends += [(arrival, id, rank, True) for rank, (arrival, _, _) in enumerate(captures[id])]
+            elif not node.outputs and id in arrivals:
+                ends += [(arrival, id, rank, False) for rank, (arrival, _, _) in enumerate(arrivals[id])]
+
+        paths = []
+        for arrival, id, rank, is_capture in heapq.nlargest(top_k, ends, key=lambda e: e[0]):
+            nodes = []
+            entry = captures[id][rank] if is_capture else arrivals[id][rank]
+            nodes.append(self.nodes[id])
+            while entry[1] is not None:
+                id, rank = entry[1], entry[2]
+                nodes.append(self.nodes[id])
+                entry = arrivals[id][rank]
+            nodes.reverse()
+            paths.append(TimingPath(arrival, nodes))
+        return paths
+
+    def best_arrivals(self, node : Node, arrivals, delay : float, top_k : int):
+        """ top_k slowest arrivals at the output of `node` through its inputs """
+        candidates = []
+        for pred_id in node.inputs:
+            for rank, (arrival, _, _) in enumerate(arrivals.get(pred_id, ())):
+                candidates.append((arrival + delay, pred_id, rank))
+        return heapq.nlargest(top_k, candidates, key=lambda c: c[0])
+
+    def read_json(self, fname, top : Optional[str] = None):
+        """ Read module `top` (by default the top module) of yosys write_json netlist """
+        with paused_gc():
+            with open(fname) as f:
+                netlist = json.load(f)
+            YosysJsonLoader(netlist, self, top).read()
+
+    def read_dot(self, fname, streaming=True):
+        """ Read graph from dot file. streaming=False uses char by char DotParser """
+        with open(fname) as f:
+            dp = StreamingDotParser(f.read(), self) if streaming else DotParser(f.readlines(), self)
+        with paused_gc():
+            dp.read_prologue()
+            dp.read_body()
+            self.propogate_connections()
 
     def write_dot(self, fname):
         
@@ -363,6 +858,22 @@ class Graph:
         res = [self.nodes[node_id] for  node_id in self.node_list if accept(self.nodes[node_id])]
         return res
 
+    def select_nodes_by_label_prefix(self, prefix : str, accept: Callable[[Node], bool] = None) -> List[Node]:
+        """ Same as select_nodes(lambda n: n.label().startswith(prefix) and accept(n)), but uses label index.
+            Nodes are returned in the order they were added within one index bucket """
+        key = prefix[:self.LABEL_PREFIX_LEN]
+        if len(key) == self.LABEL_PREFIX_LEN:
+            buckets = [self.label_index.get(key, ())]
+        else:
+            buckets = [ids for bucket_key, ids in self.label_index.items() if bucket_key.startswith(key)]
+        res = []
+        for ids in buckets:
+            for node_id in ids:
+                node = self.nodes[node_id]
+                if node.label().startswith(prefix) and (accept is None or accept(node)):
+                    res.append(node)
+        return res
+
 
     def disconnect_node_inputs(self, n:Union[Node, str]):
         if type(n) == str:
@@ -371,16 +882,18 @@ class Graph:
             c = n.inputs[id]
             other_node = self.nodes[c.node_name_from]
             del other_node.outputs[n.id]
-            self.connections.remove(c)
-        n.inputs=[]
+            self.connections.discard(c)
+        n.inputs={}
 
     def disconnect_node_outputs(self, n:Union[Node, str]):
+        if type(n) == str:
+            n = self.nodes[n]
         for id in n.outputs:
             c = n.outputs[id]
             other_node = self.nodes[c.node_name_to]
             del other_node.inputs[n.id]
-            self.connections.remove(c)
-        n.outputs=[]
+            self.connections.discard(c)
+        n.outputs={}
 
     def disconnect_node(self, n:Union[Node, str]):
         self.disconnect_node_inputs(n)
@@ -400,8 +913,10 @@ class Graph:
             print(f"Trying to delete pinned node {n.id}")
             return 
         self.disconnect_node(n)        
+        self.unindex_label(n)
         del self.nodes[n.id]
         self.node_list.remove(n.id)
+        n.graph = None
 
 
         
@@ -458,16 +973,29 @@ class DotWriter:
 
             
 
+def is_produced_wire(n : Node) -> bool:
+    return n.label().startswith('"$') or n.label().startswith('"BUF')
+
 def remove_unused_produced_wires(g : Graph):
-    while True:
-        nodes = g.select_nodes(lambda n:not n.outputs and (n.label().startswith('"$') or n.label().startswith('"BUF')))
-        if not nodes:
-            break
-        for node in nodes:
-            g.delete_node(node)
+    """ Delete `$` and BUF nodes that drive nothing, whole dead cones at once.
+
+        Only inputs of deleted nodes can become unused, so they are the only candidates
+        checked again: every node and connection is visited once.
+    """
+    unused = lambda n: not n.outputs
+    worklist = g.select_nodes_by_label_prefix('"$', unused) + g.select_nodes_by_label_prefix('"BUF', unused)
+    while worklist:
+        node = worklist.pop()
+        if g.nodes.get(node.id) is not node or node.outputs or node.id in g.pinned_nodes:
+            continue
+        drivers = [g.nodes[c.node_name_from] for c in node.inputs.values()]
+        g.delete_node(node)
+        for driver in drivers:
+            if not driver.outputs and is_produced_wire(driver):
+                worklist.append(driver)
 
 def resolve_buffers(g):
-    nodes = g.select_nodes(lambda n : n.label().startswith('"BUF'))
+    nodes = g.select_nodes_by_label_prefix('"BUF')
     for buf_node in nodes:
         if len(buf_node.outputs) != 1:
             print(f"BUF has too many outputs: {buf_node.outputs}")
@@ -488,7 +1016,10 @@ def resolve_buffers(g):
 
 
 def assign_names_to_gates(g, gates=["$xor|","$and|","$or|"]):
-    nodes = g.select_nodes(lambda n:any(gate in n.label() for gate in gates))
+    gate_types = {gate.rstrip("|") for gate in gates}
+    # loaded netlists know cell types, dot labels are searched
+    is_gate = lambda n: n.attributes["type"] in gate_types if "type" in n.attributes else any(gate in n.label() for gate in gates)
+    nodes = g.select_nodes(is_gate)
     for node in nodes:
         if len(node.outputs) != 1:
             continue
@@ -0,0 +1,74 @@
+""" Timing hot spots straight from netlist graphs, without yosys ltp.
+
+    Every file is analyzed with Graph.longest_paths. Paths are reported per file and per module,
+    module of a path is the hierarchy prefix of its end signal in the flattened netlist
+    (`alu.add_result` belongs to alu, signals without prefix belong to top).
+
+        python3 -m dottod.timing rv.json --top-k 10 --by-module --json timing.json
+"""
+import argparse
+import json
+from typing import Dict, List
+
+from dottod.dottod import Graph, Node, TimingPath
+
+
+def module_of(node : Node) -> str:
+    name = node.signal_name().split(" ")[0]
+    if name.startswith("$flatten"):
+        name = name[len("$flatten"):]
+    name = name.lstrip("\\")
+    return name.split(".")[0] if "." in name else "top"
+
+def read_graph(fname) -> Graph:
+    """ Read yosys write_json netlist or dot """
+    g = Graph()
+    if fname.endswith(".json"):
+        g.read_json(fname)
+    else:
+        g.read_dot(fname)
+    return g
+
+def print_paths(title : str, paths : List[TimingPath], verbose : bool):
+    print(title)
+    for rank, path in enumerate(paths, 1):
+        print(f"  #{rank} delay {path.delay}: {path.start().signal_name()} -> {path.end().signal_name()} ({len(path.nodes)} nodes)")
+        if verbose:
+            for node in path.nodes:
+                print(f"      {node.signal_name()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="longest combinational paths of netlist graphs")
+    parser.add_argument("netlists", nargs="+", help="dot files or yosys write_json netlists (*.json)")
+    parser.add_argument("--top-k", type=int, default=10, metavar="K", help="number of paths per report")
+    parser.add_argument("--delays", type=str, metavar="FILE", help="JSON object of cell type -> delay, overrides defaults")
+    parser.add_argument("--by-module", action="store_true", help="report top-K paths of every module separately")
+    parser.add_argument("--verbose", action="store_true", help="print every node of the paths")
+    parser.add_argument("--json", type=str, metavar="FILE", help="write the report as JSON")
+    args = parser.parse_args()
+
+    delays : Dict[str, float] = json.load(open(args.delays)) if args.delays else None
+    report = {}
+    for fname in args.netlists:
+        g = read_graph(fname)
+        paths = g.longest_paths(args.top_k, delays)
+        print_paths(f"{fname}:", paths, args.verbose)
+        report[fname] = {"paths": [path.to_json() for path in paths]}
+
+        if args.by_module:
+            modules = sorted({module_of(node) for node in g.nodes.values()})
+            report[fname]["modules"] = {}
+            for module in modules:
+                module_paths = g.longest_paths(args.top_k, delays, accept_end=lambda n: module_of(n) == module)
+                if not module_paths:
+                    continue
+                print_paths(f"{fname} {module}:", module_paths, args.verbose)
+                report[fname]["modules"][module] = [path.to_json() for path in module_paths]
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
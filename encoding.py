@@ -7,7 +7,7 @@ from nmigen import Module
 from nmigen.asserts import Assert, Assume
 from nmigen.cli import main_parser, main_runner
 
-from skeleton import bit_slice
+from skeleton import bit_slice, sign_extend
 
 class RType:
     def __init__(self, prefix=""):
@@ -77,6 +77,16 @@ class IType:
         word = opcode | (rd << 7) | (funct3 << 12) | (rs1 << 15) | (imm << 20)
         return word
 
+    @staticmethod
+    def decode_i32(word:int)->dict:
+        """ Split integer word into fields the same way elaborate() does. imm is sign-extended python int """
+        return dict(
+            opcode=bit_slice(word, 6, 0),
+            rd=bit_slice(word, 11, 7),
+            funct3=bit_slice(word, 14, 12),
+            rs1=bit_slice(word, 19, 15),
+            imm=sign_extend(bit_slice(word, 31, 20), 12))
+
         
 class SType:
     def __init__(self, prefix=""):
@@ -119,6 +129,14 @@ class UType:
         word = (opcode) | (rd << 7) | (bit_slice(imm, 31, 12) << 12) 
         return word
 
+    @staticmethod
+    def decode_i32(word:int)->dict:
+        """ Split integer word into fields the same way elaborate() does. imm is unsigned 32-bit int """
+        return dict(
+            opcode=bit_slice(word, 6, 0),
+            rd=bit_slice(word, 11, 7),
+            imm=bit_slice(word, 31, 12) << 12)
+
     def match(self, opcode=None, rd=None, imm=None) -> Value:
         """ Build boolean expression that matches x against provided parts """
         if type(imm) == int:
@@ -173,6 +191,20 @@ class BType:
 
         return value
 
+    @staticmethod
+    def decode_i32(word:int)->dict:
+        """ Split integer word into fields the same way elaborate() does. imm is sign-extended python int """
+        imm = ((bit_slice(word, 11, 8) << 1)
+            | (bit_slice(word, 30, 25) << 5)
+            | (bit_slice(word, 7, 7) << 11)
+            | (bit_slice(word, 31, 31) << 12))
+        return dict(
+            opcode=bit_slice(word, 6, 0),
+            funct3=bit_slice(word, 14, 12),
+            rs1=bit_slice(word, 19, 15),
+            rs2=bit_slice(word, 24, 20),
+            imm=sign_extend(imm, 13))
+
 
     def match(self, opcode=None, funct3=None, rs1=None, rs2=None, imm=None) -> Value:
         """ Build boolean expression that matches x against provided parts """
@@ -242,6 +274,18 @@ class JType:
         word = word | (bit_slice(imm,20,20) << 31)
         return word
 
+    @staticmethod
+    def decode_i32(word:int)->dict:
+        """ Split integer word into fields the same way elaborate() does. imm is sign-extended python int """
+        imm = ((bit_slice(word, 30, 21) << 1)
+            | (bit_slice(word, 20, 20) << 11)
+            | (bit_slice(word, 19, 12) << 12)
+            | (bit_slice(word, 31, 31) << 20))
+        return dict(
+            opcode=bit_slice(word, 6, 0),
+            rd=bit_slice(word, 11, 7),
+            imm=sign_extend(imm, 21))
+
 
 
 class __Verify:    
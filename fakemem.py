@@ -0,0 +1,164 @@
+from typing import Dict, List, Tuple
+
+from nmigen import Module, Signal, Const, Memory, Cat, Mux
+from nmigen.build import Platform
+
+from skeleton import ElaboratableAbstract
+from membus import MemoryBus
+from membuild import MemBuild
+
+
+class FakeMemory(ElaboratableAbstract):
+    """ Read-only memory for simulation that serves `bus` from nmigen Memory.
+
+        Memory is word-organized, there is one Memory per region of MemBuild.regions(), so a sparse
+        map costs only the words around its bytes. Every access reads two adjacent words and picks
+        4 bytes from them, so reads don't need to be aligned. Each byte outside of the image reads as 0xFF,
+        so a read that starts at a missing address still returns the bytes of the image it covers
+        (unlike the old per-address switch, which returned 0xFFFFFFFF for it).
+        Elaboration and simulation cost don't depend on the size of the program.
+        Multi-lane bus is served in one transaction: lane i gets the word at addr + i*word_bytes.
+
+        latency - number of cycles the address must stay on the bus before ready is raised.
+        0 serves every read combinationally, other values model slow memory in `domain`.
+    """
+    def __init__(self, bus : MemoryBus, mem : Dict[int, int], xlen=32, latency=0, domain="i"):
+        super().__init__()
+        assert xlen % 8 == 0, "word must be octet aligned"
+        assert latency >= 0, "latency can't be negative"
+        self.bus = bus
+        self.xlen = xlen
+        self.latency = latency
+        self.domain = domain
+        self.word_bytes = xlen // 8
+
+        # (base, size, memory) of every region
+        self.regions : List[Tuple[int, int, Memory]] = []
+        fill_word = bytearray([0xFF]) * self.word_bytes
+        for n, (base, image) in enumerate(MemBuild(existing_dict=mem).regions(align=self.word_bytes)):
+            # Fill words around the region let unaligned reads cross its edges
+            if base >= self.word_bytes:
+                base -= self.word_bytes
+                image = fill_word + image
+            size = len(image)
+            image += fill_word
+            words = [int.from_bytes(image[i:i+self.word_bytes], "little") for i in range(0, len(image), self.word_bytes)]
+            self.regions.append((base, size, Memory(width=xlen, depth=len(words), init=words, name=f"fakemem{n}")))
+
+        self.add_existing_input_signal(bus.addr)
+        self.add_existing_input_signal(bus.en)
+        self.add_existing_output_signal(bus.value)
+        self.add_existing_output_signal(bus.ready)
+        burst_inputs, burst_outputs = bus.burst_ports()
+        for signal in burst_inputs:
+            self.add_existing_input_signal(signal)
+        for signal in burst_outputs:
+            self.add_existing_output_signal(signal)
+
+    def elaborate(self, p:Platform) -> Module:
+        m = Module()
+        comb = m.d.comb
+        bus = self.bus
+        offset_bits = (self.word_bytes - 1).bit_length()
+
+        values = [Const((1 << self.xlen) - 1, self.xlen) for _ in bus.values]
+        for n, (base, size, memory) in enumerate(self.regions):
+            relative_addr = Signal(bus.addr.width, name=f"fakemem{n}_rel_addr")
+            comb += relative_addr.eq(bus.addr - base)
+            word_index = relative_addr[offset_bits:]
+            byte_offset = relative_addr[:offset_bits]
+
+            # lane i is built from words i and i+1 of the access
+            ports = []
+            for i in range(bus.lanes + 1):
+                m.submodules[f"region{n}_word{i}"] = port = memory.read_port(domain="comb")
+                comb += port.addr.eq(word_index + i)
+                ports.append(port)
+
+            for i in range(bus.lanes):
+                joined = Cat(ports[i].data, ports[i + 1].data)
+                in_range = (relative_addr + i * self.word_bytes) < size
+                values[i] = Mux(in_range, (joined >> (byte_offset * 8))[:self.xlen], values[i])
+
+        with m.If(bus.en):
+            for value, region_value in zip(bus.values, values):
+                comb += value.eq(region_value)
+        if bus.valid is not None:
+            for i in range(bus.lanes):
+                comb += bus.valid[i].eq(i < bus.burst)
+        if self.latency == 0:
+            comb += bus.ready.eq(1)
+        else:
+            self.elaborate_latency(m)
+        return m
+
+    def elaborate_latency(self, m : Module):
+        """ Raise ready only after address didn't change for `latency` cycles """
+        comb = m.d.comb
+        sync = m.d[self.domain]
+        bus = self.bus
+
+        last_addr = Signal.like(bus.addr, name="fakemem_last_addr")
+        waited = Signal(range(self.latency + 1), name="fakemem_waited")
+        changed = Signal(name="fakemem_addr_changed")
+
+        comb += changed.eq(bus.addr != last_addr)
+        sync += last_addr.eq(bus.addr)
+        with m.If(changed):
+            sync += waited.eq(1)
+        with m.Elif(waited != self.latency):
+            sync += waited.eq(waited + 1)
+        comb += bus.ready.eq(~changed & (waited == self.latency))
+
+
+#
+# FORMAL VERIFICATION
+#
+from nmigen.asserts import Assert
+from nmigen.cli import main as nmigen_main
+
+def __main():
+    m = Module()
+    bus = MemoryBus(32, 32, "bus")
+    mem = (MemBuild(0x100)
+        .add_i32(0x11223344)
+        .add_i32(0x55667788)
+        .set_origin(0x8000_0000)
+        .add_i32(0x99AABBCC)
+        .dict)
+    m.submodules.mem = fakemem = FakeMemory(bus, mem)
+    comb = m.d.comb
+
+    with m.If(bus.en):
+        with m.Switch(bus.addr):
+            with m.Case(0x100):
+                comb += Assert(bus.value == 0x11223344)
+            with m.Case(0x104):
+                comb += Assert(bus.value == 0x55667788)
+            with m.Case(0x101):
+                comb += Assert(bus.value == 0x88112233)
+            with m.Case(0x106):
+                comb += Assert(bus.value == 0xFFFF5566)
+            with m.Case(0xFF):
+                comb += Assert(bus.value == 0x223344FF)
+            with m.Case(0xFC):
+                comb += Assert(bus.value == 0xFFFFFFFF)
+            with m.Case(0x8000_0000):
+                comb += Assert(bus.value == 0x99AABBCC)
+            with m.Case(0x7FFF_FFFE):
+                comb += Assert(bus.value == 0xBBCCFFFF)
+    comb += Assert(bus.ready)
+
+    wide = MemoryBus(32, 32, "wide", lanes=2)
+    m.submodules.wide_mem = wide_fakemem = FakeMemory(wide, mem)
+    with m.If(wide.en & (wide.addr == 0x100)):
+        comb += Assert(wide.values[0] == 0x11223344)
+        comb += Assert(wide.values[1] == 0x55667788)
+        comb += Assert(wide.valid[1] == (wide.burst >= 2))
+    with m.If(wide.en & (wide.addr == 0x104)):
+        comb += Assert(wide.values[1] == 0xFFFFFFFF)
+
+    nmigen_main(m, ports=fakemem.ports() + wide_fakemem.ports())
+
+if __name__ == "__main__":
+    __main()
@@ -1,5 +1,5 @@
 from nmigen import Module
-from typing import List, Type
+from typing import List, Type, Optional, Tuple, Union
 
 class Instruction:
     def __init__(self, core:'Core' = None):
@@ -13,6 +13,16 @@ class Instruction:
         """ Check that instruction can be executed """
         return 0    
 
+    def dispatch_keys(self) -> Optional[List[Tuple[int, Union[int, str, None]]]]:
+        """ Return (opcode, funct3) pairs that select the instruction, they must be equivalent to check().
+            funct3 is either value, nmigen pattern ("-" bits are ignored), or None if funct3 is ignored.
+            None means instruction can be selected only by check() """
+        return None
+
+    def cycles(self) -> int:
+        """ Number of values of core.cycle the instruction runs through, 1 for single-cycle instructions """
+        return 1
+
     def proofs(self) -> List[Type['ProofOverTicks']]:
         """ Return list of formal proofs associated with the instruction """
         pass
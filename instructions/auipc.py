@@ -14,6 +14,9 @@ class AuipcInstr(Instruction):
         core : Core = self.core
         return core.utype.opcode == Opcode.Auipc
 
+    def dispatch_keys(self):
+        return [(Opcode.Auipc, None)]
+
     def implement(self):
         core : Core = self.core
         core.assign_gpr(core.utype.rd, core.pc + core.utype.imm)
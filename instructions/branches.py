@@ -36,7 +36,7 @@ class BranchBase(Instruction):
     
         # With this, we can move to new pc
         with m.If(eq_result):
-            core.assign_pc(core.pc + core.btype.imm)
+            core.assign_pc(core.call_address_adder(core.pc, core.btype.imm))
             # Let the world know what branch instruction was executed
             core.emit_debug_opcode(self.decode_debug_opcode(), core.btype.imm)
         with m.Else():
@@ -50,6 +50,10 @@ class BranchBase(Instruction):
         core : Core = self.core
         return (core.btype.opcode == Opcode.Branch) & (core.btype.funct3[1:3] == Const(self.op_branch().value >> 1, 2))
 
+    def dispatch_keys(self):
+        # funct3[0] only negates comparison
+        return [(Opcode.Branch, f"{self.op_branch().value >> 1:02b}-")]
+
 
     def decode_debug_opcode(self):
         core : Core = self.core
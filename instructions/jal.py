@@ -13,11 +13,14 @@ class JalInstr(Instruction):
         core : Core = self.core
         return core.jtype.opcode == Opcode.Jal
 
+    def dispatch_keys(self):
+        return [(Opcode.Jal, None)]
+
     def implement(self):
         core : Core = self.core
         
         core.assign_gpr(core.jtype.rd, core.pc + 4)
-        core.assign_pc(core.pc + core.jtype.imm)
+        core.assign_pc(core.call_address_adder(core.pc, core.jtype.imm))
         core.emit_debug_opcode(DebugOpcode.JAL, core.jtype.imm)
 
     def proofs(self):
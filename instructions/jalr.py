@@ -13,13 +13,16 @@ class JalrInstr(Instruction):
         core : Core = self.core
         return (core.itype.opcode == Opcode.Jalr) & (core.itype.funct3 == 0)
 
+    def dispatch_keys(self):
+        return [(Opcode.Jalr, 0)]
+
     def implement(self):
         core : Core = self.core
         
         core.assign_gpr(core.itype.rd, core.pc + 4)
         all_bits = (1 << core.xlen) - 1
         mask = all_bits ^ 1 #clear_lsb
-        target_address = ((core.query_rs1() + core.itype.imm)[0:32]) & mask
+        target_address = core.call_address_adder(core.query_rs1(), core.itype.imm) & mask
         core.assign_pc(target_address)
         core.emit_debug_opcode(DebugOpcode.JALR, core.itype.imm)
 
@@ -18,13 +18,21 @@ class LoadBase(Instruction):
         core : Core = self.core
         return (core.itype.opcode == Opcode.Load) & (core.itype.funct3[0:2] == (self.funct3() & 0b11) )
 
+    def dispatch_keys(self):
+        # funct3[2] only selects unsigned load
+        return [(Opcode.Load, f"-{self.funct3() & 0b11:02b}")]
+
+    def cycles(self):
+        # cycle 0 schedules read, cycle 1 waits for data
+        return 2
+
 
     def implement(self):            
         core : Core = self.core
         iclk = core.iclk
         m = core.current_module
 
-        read_address = (core.query_rs1() + core.itype.imm)[:32]
+        read_address = core.call_address_adder(core.query_rs1(), core.itype.imm)
         debug_opcode = Mux(core.itype.funct3[2], self.debug_opcodes()[1], self.debug_opcodes()[0])
         core.emit_debug_opcode(debug_opcode, read_address)
 
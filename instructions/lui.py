@@ -14,6 +14,9 @@ class LuiInstr(Instruction):
         core : Core = self.core
         return core.utype.opcode == Opcode.Lui
 
+    def dispatch_keys(self):
+        return [(Opcode.Lui, None)]
+
     def implement(self):
         core : Core = self.core
         
@@ -20,6 +20,9 @@ class OpImmInstr(Instruction):
         """ Check that instruction can be executed """
         return core.itype.opcode == Opcode.OpImm
 
+    def dispatch_keys(self):
+        return [(Opcode.OpImm, None)]
+
     def implement(self):
         
 
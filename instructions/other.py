@@ -0,0 +1,40 @@
+from nmigen import Const
+from nmigen.asserts import AnySeq
+
+from instruction import Instruction
+from core import Core
+from opcodes import DebugOpcode
+
+class OtherInstr(Instruction):
+    # Stands for every instruction the core is built without (rv.py --prune).
+    # It's unconstrained: every cycle it either finishes, writing anything to any GPR and jumping anywhere,
+    # or stays busy and may read memory at any address like a load does, which takes the bus from fetch.
+    # It runs through up to CYCLES values of core.cycle and then can wait in the last one as long as it wants,
+    # so it reaches every state removed instructions reach. Must be added last, as it accepts anything.
+    # Only for formal proofs: simulator can't run AnySeq
+    CYCLES = 4
+
+    def check(self):
+        """ Check that instruction can be executed """
+        return Const(1)
+
+    def cycles(self):
+        return self.CYCLES
+
+    def implement(self):
+        core : Core = self.core
+        m = core.current_module
+
+        with m.If(AnySeq(1)):
+            core.assign_gpr(AnySeq(5), AnySeq(core.xlen))
+            core.assign_pc(AnySeq(core.xlen))
+            core.emit_debug_opcode(DebugOpcode.NOT_SPECIFIED)
+        with m.Else():
+            with m.If(AnySeq(1)):
+                core.schedule_read(AnySeq(core.xlen), 0)
+            with m.If(core.cycle != self.CYCLES - 1):
+                core.iclk += core.cycle.eq(core.cycle + 1)
+            core.emit_debug_opcode(DebugOpcode.AWAIT_READ)
+
+    def proofs(self):
+        return []
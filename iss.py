@@ -0,0 +1,255 @@
+import sys
+import time
+from typing import Dict, Callable, List, Optional
+
+from encoding import IType, UType, JType, BType
+from opcodes import Opcode, OpImm, OpBranch, OpLoad
+from membuild import MemBuild
+
+MASK32 = 0xFFFF_FFFF
+# Same as OpImmInstr.IMM_SHR_ARITH_BIT
+IMM_SHR_ARITH_BIT = 10
+
+class ISS:
+    """ Functional RV32I instruction set simulator.
+
+        Runs memory images built by MemBuild without RTL. Instruction fields are
+        split by IType/UType/JType/BType.decode_i32, so decoding follows encoding.py.
+        Semantics mirror Core: reset vector 0x200, invalid instructions are skipped,
+        memory returns 0xFF for bytes outside the image (like FakeMemory).
+    """
+    RESET_PC = 0x200
+
+    def __init__(self, mem : Dict[int, int], pc=RESET_PC):
+        self.mem = mem
+        self.r : List[int] = [0] * 32
+        self.pc = pc
+        # number of retired instructions (including invalid ones, as Core skips them)
+        self.retired = 0
+        # number of instructions that were not recognized
+        self.invalid = 0
+        # pc -> predecoded instruction. Memory is never written, so cache is never invalidated
+        self.decoded : Dict[int, Callable[[int], int]] = {}
+
+    def read_word(self, addr : int) -> int:
+        """ Read little-endian word exactly as FakeMemory serves it: every byte outside of the image is 0xFF """
+        mem = self.mem
+        return (mem.get(addr, 0xff)
+            | (mem.get(addr+1, 0xff) << 8)
+            | (mem.get(addr+2, 0xff) << 16)
+            | (mem.get(addr+3, 0xff) << 24))
+
+    def run(self, max_steps : int, halt_pc : Optional[int] = None) -> int:
+        """ Execute up to max_steps instructions or until pc reaches halt_pc. Return number of executed instructions """
+        decoded = self.decoded
+        decode = self.decode
+        pc = self.pc
+        steps = 0
+        while steps < max_steps and pc != halt_pc:
+            fn = decoded.get(pc)
+            if fn is None:
+                fn = decoded[pc] = decode(pc)
+            pc = fn(pc)
+            steps += 1
+        self.pc = pc
+        self.retired += steps
+        return steps
+
+    def step(self) -> int:
+        """ Execute single instruction and return new pc """
+        self.run(1)
+        return self.pc
+
+    def decode(self, pc : int) -> Callable[[int], int]:
+        """ Decode instruction at pc into function that executes it and returns next pc """
+        word = self.read_word(pc)
+        opcode = word & 0x7F
+        if opcode == Opcode.OpImm:
+            fn = self.decode_op_imm(IType.decode_i32(word))
+        elif opcode == Opcode.Jal:
+            fn = self.decode_jal(JType.decode_i32(word))
+        elif opcode == Opcode.Jalr:
+            fn = self.decode_jalr(IType.decode_i32(word))
+        elif opcode == Opcode.Lui:
+            fn = self.decode_lui(UType.decode_i32(word))
+        elif opcode == Opcode.Auipc:
+            fn = self.decode_auipc(UType.decode_i32(word))
+        elif opcode == Opcode.Branch:
+            fn = self.decode_branch(BType.decode_i32(word))
+        elif opcode == Opcode.Load:
+            fn = self.decode_load(IType.decode_i32(word))
+        else:
+            fn = None
+        if fn is None:
+            fn = self.decode_invalid()
+        return fn
+
+    def decode_invalid(self):
+        def invalid(pc):
+            self.invalid += 1
+            return (pc + 4) & MASK32
+        return invalid
+
+    def decode_op_imm(self, i : dict):
+        r = self.r
+        rd, rs1, funct3 = i["rd"], i["rs1"], i["funct3"]
+        imm = i["imm"] & MASK32
+        signed_imm = i["imm"]
+        shamt = imm & 0x1F
+        # every operation is its own closure: it keeps the hot loop at one call per instruction
+        if rd == 0:
+            def op_imm(pc):
+                return (pc + 4) & MASK32
+        elif funct3 == OpImm.SHIFT_LEFT:
+            def op_imm(pc):
+                r[rd] = (r[rs1] << shamt) & MASK32
+                return (pc + 4) & MASK32
+        elif funct3 == OpImm.SHIFT_RIGHT and (imm >> IMM_SHR_ARITH_BIT) & 1:
+            def op_imm(pc):
+                r[rd] = ((r[rs1] - ((r[rs1] & 0x8000_0000) << 1)) >> shamt) & MASK32
+                return (pc + 4) & MASK32
+        elif funct3 == OpImm.SHIFT_RIGHT:
+            def op_imm(pc):
+                r[rd] = r[rs1] >> shamt
+                return (pc + 4) & MASK32
+        elif funct3 == OpImm.ADD:
+            def op_imm(pc):
+                r[rd] = (r[rs1] + imm) & MASK32
+                return (pc + 4) & MASK32
+        elif funct3 == OpImm.SLT:
+            def op_imm(pc):
+                r[rd] = int((r[rs1] ^ 0x8000_0000) - 0x8000_0000 < signed_imm)
+                return (pc + 4) & MASK32
+        elif funct3 == OpImm.SLTU:
+            def op_imm(pc):
+                r[rd] = int(r[rs1] < imm)
+                return (pc + 4) & MASK32
+        elif funct3 == OpImm.XOR:
+            def op_imm(pc):
+                r[rd] = r[rs1] ^ imm
+                return (pc + 4) & MASK32
+        elif funct3 == OpImm.OR:
+            def op_imm(pc):
+                r[rd] = r[rs1] | imm
+                return (pc + 4) & MASK32
+        else: # OpImm.AND
+            def op_imm(pc):
+                r[rd] = r[rs1] & imm
+                return (pc + 4) & MASK32
+        return op_imm
+
+    def decode_jal(self, j : dict):
+        r = self.r
+        rd, imm = j["rd"], j["imm"]
+        def jal(pc):
+            if rd:
+                r[rd] = (pc + 4) & MASK32
+            return (pc + imm) & MASK32
+        return jal
+
+    def decode_jalr(self, i : dict):
+        if i["funct3"] != 0:
+            return None
+        r = self.r
+        rd, rs1, imm = i["rd"], i["rs1"], i["imm"]
+        def jalr(pc):
+            target = (r[rs1] + imm) & (MASK32 ^ 1)
+            if rd:
+                r[rd] = (pc + 4) & MASK32
+            return target
+        return jalr
+
+    def decode_lui(self, u : dict):
+        r = self.r
+        rd, imm = u["rd"], u["imm"]
+        def lui(pc):
+            if rd:
+                r[rd] = imm
+            return (pc + 4) & MASK32
+        return lui
+
+    def decode_auipc(self, u : dict):
+        r = self.r
+        rd, imm = u["rd"], u["imm"]
+        def auipc(pc):
+            if rd:
+                r[rd] = (pc + imm) & MASK32
+            return (pc + 4) & MASK32
+        return auipc
+
+    def decode_branch(self, b : dict):
+        r = self.r
+        rs1, rs2, imm, funct3 = b["rs1"], b["rs2"], b["imm"], b["funct3"]
+        # Like BranchBase.check, only funct3[1:3] selects comparison, funct3[0] negates it
+        kind = funct3 >> 1
+        if kind == OpBranch.BEQ >> 1:
+            def branch(pc):
+                if (r[rs1] == r[rs2]) != negate:
+                    return (pc + imm) & MASK32
+                return (pc + 4) & MASK32
+        elif kind == OpBranch.BLT >> 1:
+            def branch(pc):
+                if ((r[rs1] ^ 0x8000_0000) < (r[rs2] ^ 0x8000_0000)) != negate:
+                    return (pc + imm) & MASK32
+                return (pc + 4) & MASK32
+        elif kind == OpBranch.BLTU >> 1:
+            def branch(pc):
+                if (r[rs1] < r[rs2]) != negate:
+                    return (pc + imm) & MASK32
+                return (pc + 4) & MASK32
+        else:
+            return None
+        negate = bool(funct3 & 1)
+        return branch
+
+    def decode_load(self, i : dict):
+        r = self.r
+        read_word = self.read_word
+        rd, rs1, imm, funct3 = i["rd"], i["rs1"], i["imm"], i["funct3"]
+        # Like LoadBase.check, funct3[0:2] selects width, funct3[2] selects unsigned load
+        width = funct3 & 0b11
+        is_unsigned = bool(funct3 & 0b100)
+        if width == OpLoad.LB:
+            bits = 8
+        elif width == OpLoad.LH:
+            bits = 16
+        elif width == OpLoad.LW:
+            bits = 32
+        else:
+            return None
+        mask = (1 << bits) - 1
+        sign = 1 << (bits - 1)
+        def load(pc):
+            value = read_word((r[rs1] + imm) & MASK32) & mask
+            if not is_unsigned and value & sign:
+                value |= MASK32 ^ mask
+            if rd:
+                r[rd] = value
+            return (pc + 4) & MASK32
+        return load
+
+    def dump(self, file=sys.stdout):
+        print(f"pc={self.pc:08X} retired={self.retired} invalid={self.invalid}", file=file)
+        for i in range(0, 32, 4):
+            print("  ".join(f"x{j:<2}={self.r[j]:08X}" for j in range(i, i+4)), file=file)
+
+
+def __benchmark(n=2_000_000):
+    # x1 counts down from 1000; inner loop re-runs until n instructions were executed
+    mem = (MemBuild(ISS.RESET_PC)
+        .addi(1, 0, 1000)
+        .addi(2, 2, 3)
+        .add_i32(IType.build_i32(opcode=Opcode.OpImm, funct3=OpImm.AND, rd=3, rs1=2, imm=0xFF))
+        .addi(1, 1, -1)
+        .bne(1, 0, -12)
+        .j(-20)
+        .dict)
+    iss = ISS(mem)
+    start = time.perf_counter()
+    iss.run(n)
+    elapsed = time.perf_counter() - start
+    iss.dump()
+    print(f"{iss.retired} instructions in {elapsed:.3f}s: {iss.retired / elapsed / 1e6:.2f} MIPS")
+
+if __name__ == "__main__":
+    __benchmark()
@@ -1,33 +1,167 @@
 #!/usr/bin/python3
+""" Critical path report of the core.
+
+    Generates RTLIL with rv.py, runs yosys `ltp -noff` over every module and over the flattened
+    design, and writes into --out-dir:
+    * ltp.txt  - top-K longest topological paths ranked by length
+    * ltp.json - the same paths with every node
+    * ltp.dot  - flattened design (yosys `show`) with the longest path colored red
+
+    Arguments ltp.py doesn't know are passed to rv.py, so the same core variants can be compared:
+        ./ltp.py --top-k 5 -- --dispatch switch --adder kogge-stone
+    If yosys already ran, --ltp and --dot take its log and graph instead.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
 import sys
+from typing import List, Optional
+
 from dottod.dottod import Graph, clean_nmigen_graph, color_connections
 
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+HEADER_RE = re.compile(r"^Longest topological path in (\S+) \(length=(\d+)\):")
+# `    3: \alu.result [7] (via $add$alu.py:42$123)`, bit index and via are optional
+NODE_RE = re.compile(r"^\s*(\d+):\s+(\S+)(?:\s+\[\d+\])?(?:\s+\(via (.*)\))?\s*$")
+
+
+class LongestPath:
+    """ Longest topological path of one module as reported by yosys ltp """
+    def __init__(self, module : str, length : int, flat : bool):
+        self.module = module
+        self.length = length
+        # path of flattened design, not of a module on its own
+        self.flat = flat
+        self.nodes : List[str] = []
+        self.cells : List[Optional[str]] = []
+
+    def name(self) -> str:
+        return f"{self.module} (flattened)" if self.flat else self.module
+
+    def labels(self) -> List[str]:
+        """ Labels of the path nodes in the form yosys `show` writes them """
+        return ['"%s"' % (node[1:] if node.startswith("\\") else node) for node in self.nodes]
+
+    def to_json(self) -> dict:
+        return {
+            "module": self.module,
+            "flat": self.flat,
+            "length": self.length,
+            "nodes": [{"wire": node, "via": cell} for node, cell in zip(self.nodes, self.cells)],
+        }
+
+
+def parse_ltp(text : str, flat=False) -> List[LongestPath]:
+    """ Parse yosys ltp log, one path per module """
+    paths = []
+    path = None
+    for line in text.splitlines():
+        header = HEADER_RE.match(line)
+        if header:
+            path = LongestPath(header.group(1), int(header.group(2)), flat)
+            paths.append(path)
+            continue
+        node = NODE_RE.match(line) if path is not None else None
+        if node is None:
+            path = None
+            continue
+        path.nodes.append(node.group(2))
+        path.cells.append(node.group(3))
+    return paths
+
+
+def rank_paths(paths : List[LongestPath], top_k : int) -> List[LongestPath]:
+    return sorted(paths, key=lambda p: (-p.length, p.flat, p.module))[:top_k]
+
+
+def generate_rtlil(rv_args : List[str], il_path : str):
+    cmd = [sys.executable, os.path.join(HERE, "rv.py")] + rv_args + ["generate", "-t", "il", il_path]
+    subprocess.run(cmd, check=True, cwd=HERE)
+
+
+def run_yosys(yosys : str, il_path : str, out_dir : str):
+    """ Write ltp_modules.txt, ltp_flat.txt and rv.dot into out_dir """
+    modules_log = os.path.join(out_dir, "ltp_modules.txt")
+    flat_log = os.path.join(out_dir, "ltp_flat.txt")
+    script = "; ".join([
+        f"read_ilang {il_path}",
+        "hierarchy -top top",
+        "proc",
+        "opt",
+        f"tee -q -o {modules_log} ltp -noff",
+        "flatten",
+        "opt_clean",
+        f"tee -q -o {flat_log} ltp -noff",
+        f"show -format dot -prefix {os.path.join(out_dir, 'rv')} top",
+    ])
+    subprocess.run([yosys, "-q", "-p", script], check=True)
+    return modules_log, flat_log, os.path.join(out_dir, "rv.dot")
+
+
+def write_report(paths : List[LongestPath], txt_path : str, json_path : str):
+    with open(txt_path, "w") as f:
+        for rank, path in enumerate(paths, 1):
+            print(f"#{rank} {path.name()}: length {path.length}", file=f)
+            for node, cell in zip(path.nodes, path.cells):
+                via = f" (via {cell})" if cell else ""
+                print(f"    {node}{via}", file=f)
+    with open(json_path, "w") as f:
+        json.dump([path.to_json() for path in paths], f, indent=2)
+
+
+def annotate_dot(dot_path : str, path : LongestPath, out_path : str):
+    """ Color nodes of the path red and clean up nmigen noise """
+    labels = set(path.labels())
+    g = Graph()
+    g.read_dot(dot_path)
+    for node in g.select_nodes(lambda n : n.label() in labels):
+        node.set_property("color", '"red"')
+        node.set_property("fontcolor", '"red"')
+    clean_nmigen_graph(g)
+    color_connections(g)
+    g.write_dot(out_path)
+
 
-ltp_data = open("/tmp/ltp").readlines()
-for i, txt in enumerate(ltp_data):
-    if txt.startswith("Longest topological path"):
-        del ltp_data[:i+1]
+def main():
+    parser = argparse.ArgumentParser(description="longest topological paths of the core")
+    parser.add_argument("--top-k", type=int, default=10, metavar="K", help="number of paths in the report")
+    parser.add_argument("--out-dir", type=str, default="test_results/ltp", help="where to put RTLIL, yosys logs and reports")
+    parser.add_argument("--yosys", type=str, default="yosys", help="yosys executable")
+    parser.add_argument("--ltp", type=str, action="append", metavar="LOG", help="use existing ltp log instead of running yosys (may be repeated)")
+    parser.add_argument("--dot", type=str, metavar="FILE", help="use existing dot graph instead of running yosys")
+    args, rv_args = parser.parse_known_args()
+    if rv_args and rv_args[0] == "--":
+        rv_args = rv_args[1:]
 
-for i in range(len(ltp_data)):
-    line = ltp_data[i]
-    colon =  line.find(':')
-    ltp_data[i] = ltp_data[i][colon+3:].strip()
-    space = ltp_data[i].find(" ")
-    if space > 0:
-        ltp_data[i] = ltp_data[i][:space]
+    out_dir = os.path.abspath(args.out_dir)
+    os.makedirs(out_dir, exist_ok=True)
 
-    if ltp_data[i].startswith('\\'):
-        ltp_data[i] = ltp_data[i][1:] #strip backslash
-    ltp_data[i] = '"%s"'%ltp_data[i]
+    paths = []
+    if args.ltp:
+        for log in args.ltp:
+            paths += parse_ltp(open(log).read())
+        dot_path = args.dot
+    else:
+        il_path = os.path.join(out_dir, "rv.il")
+        generate_rtlil(rv_args, il_path)
+        modules_log, flat_log, dot_path = run_yosys(args.yosys, il_path, out_dir)
+        paths += parse_ltp(open(modules_log).read())
+        paths += parse_ltp(open(flat_log).read(), flat=True)
+    assert paths, "yosys reported no paths"
 
+    ranked = rank_paths(paths, args.top_k)
+    write_report(ranked, os.path.join(out_dir, "ltp.txt"), os.path.join(out_dir, "ltp.json"))
+    for rank, path in enumerate(ranked, 1):
+        print(f"#{rank} {path.name()}: length {path.length}")
 
-g = Graph()
-g.read_dot(sys.argv[1])
+    if dot_path:
+        # dot shows flattened design, so its own path is the one to color
+        flat_paths = [path for path in paths if path.flat] or paths
+        annotate_dot(dot_path, rank_paths(flat_paths, 1)[0], os.path.join(out_dir, "ltp.dot"))
 
-for node in g.select_nodes(lambda n : n.label() in ltp_data):
-    node.set_property("color", '"red"')
-    node.set_property("fontcolor", '"red"')
 
-clean_nmigen_graph(g)
-color_connections(g)
-g.write_dot("/tmp/ltp.dot")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from encoding import IType, JType, UType, BType
-from opcodes import Opcode, OpImm, OpBranch, OpLoad
+from opcodes import Opcode, OpImm, OpBranch, OpLoad, OpSystem
+from typing import List, Tuple
 
 class MemBuild:
     def __init__(self, pc=0x0, existing_dict=None):
@@ -19,6 +20,28 @@ class MemBuild:
         self.pc += 4
         return self
 
+    def regions(self, fill=0xFF, align=4, max_gap=0x1000) -> List[Tuple[int, bytearray]]:
+        """ Return [(base, bytes)] - contiguous copies of the memory, one per cluster of used addresses.
+            Addresses less than max_gap bytes apart share a region, its gaps are filled with `fill`.
+            Bases are aligned and regions are padded to `align`, so a sparse map (code at 0x200,
+            data at 0x80000000) costs only the bytes it uses """
+        regions = []
+        addresses = sorted(self.dict)
+        start = 0
+        while start < len(addresses):
+            stop = start + 1
+            while stop < len(addresses) and addresses[stop] - addresses[stop - 1] < max_gap:
+                stop += 1
+            base = addresses[start] & ~(align - 1)
+            end = addresses[stop - 1] + 1
+            end += (-end) % align
+            data = bytearray([fill]) * (end - base)
+            for address in addresses[start:stop]:
+                data[address - base] = self.dict[address]
+            regions.append((base, data))
+            start = stop
+        return regions
+
     def mv(self, rd, rs1):
         return self.addi(rd, rs1, 0)
     def addi(self, rd, rs1, imm):
@@ -34,6 +57,9 @@ class MemBuild:
         return self.add_i32(UType.build_i32(Opcode.Lui, rd, imm))
     def nop(self):
         return self.mv(0, 0)
+    def ebreak(self):
+        """ EBREAK. Core doesn't implement it, simulation uses it as a halt sentinel """
+        return self.add_i32(IType.build_i32(opcode=Opcode.System, imm=OpSystem.EBREAK))
     def auipc(self, rd, imm):
         return self.add_i32(UType.build_i32(opcode=Opcode.Auipc, rd=rd, imm=imm))
     def beq(self, rs1, rs2, imm):
@@ -66,3 +92,8 @@ if __name__ == "__main__":
     assert m.dict[1] == 0x33
     assert m.dict[2] == 0x22
     assert m.dict[3] == 0x11
+    m.set_origin(9).add_i32(0xAABBCCDD)
+    m.set_origin(0x8000_0000).add_i32(0x55667788)
+    assert m.regions() == [
+        (0, bytearray([0x44, 0x33, 0x22, 0x11, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0xDD, 0xCC, 0xBB, 0xAA, 0xFF, 0xFF, 0xFF])),
+        (0x8000_0000, bytearray([0x88, 0x77, 0x66, 0x55]))]
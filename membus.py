@@ -1,7 +1,7 @@
 from nmigen import Signal
 class MemoryBus:
 
-    def __init__(self, alen, xlen, prefix=""):
+    def __init__(self, alen, xlen, prefix="", lanes=1):
         if prefix:
             prefix = f"{prefix}_"
 
@@ -17,14 +17,34 @@ class MemoryBus:
         self.seq = Signal(name=f"{prefix}_seq")
 
         # Value that is beging read from/sent to 
-        #TODO: allow several values
         self.value = Signal(xlen, name=f"{prefix}_value")
 
         # for read bus - value was succesfully read
         # for write bus - value was succesfully written
         self.ready = Signal()
 
-    def init_read(self, d, addr, seq=0):
+        # Burst reads: lane i carries word at addr + i*xlen/8, lane 0 is `value`.
+        # Single-lane bus has no burst/valid signals
+        self.lanes = lanes
+        self.values = [self.value] + [Signal(xlen, name=f"{prefix}value{i}") for i in range(1, lanes)]
+        if lanes > 1:
+            # number of words requested, 1..lanes
+            self.burst = Signal(range(lanes + 1), name=f"{prefix}burst")
+            # valid[i] is set if values[i] holds data. Valid lanes always start from lane 0
+            self.valid = Signal(lanes, name=f"{prefix}valid")
+        else:
+            self.burst = None
+            self.valid = None
+
+    def init_read(self, d, addr, seq=0, burst=1):
         d += self.en.eq(1)
         d += self.addr.eq(addr)
         d += self.seq.eq(seq)
+        if self.burst is not None:
+            d += self.burst.eq(burst)
+
+    def burst_ports(self):
+        """ Return (signals driven by reader, signals driven by memory) that exist only on multi-lane bus """
+        if self.lanes == 1:
+            return [], []
+        return [self.burst], [self.valid] + self.values[1:]
@@ -8,6 +8,7 @@ class Opcode(IntEnum):
     Auipc = 0b0010111
     Branch= 0b1100011
     Load  = 0b0000011
+    System= 0b1110011
 
 class OpLoad(IntEnum):
     LB = 0b000
@@ -16,6 +17,11 @@ class OpLoad(IntEnum):
     LBU = 0b100
     LHU = 0b101
 
+class OpSystem(IntEnum):
+    """ imm of IType for use with System (funct3=0) """
+    ECALL  = 0
+    EBREAK = 1
+
 class OpBranch(IntEnum):
     """ Funct3 for use with Branch """
     BEQ  = 0b000
@@ -7,6 +7,8 @@ from typing import List
 from membuild import MemBuild
 
 class ProofAuipc(ProofOverTicks): 
+    UNITS = []
+
     def __init__(self):
         super().__init__(1)
 
@@ -16,9 +18,12 @@ class ProofAuipc(ProofOverTicks):
         return []
 
 
+    def main_condition(self):
+        return self.time[1].at_instruction_start() & (self.time[1].utype.opcode == Opcode.Auipc)
+
     def run_main_proof(self):
         m = self.module
-        with m.If(self.time[1].at_instruction_start() & (self.time[1].utype.opcode == Opcode.Auipc)):
+        with m.If(self.main_condition()):
             self.run_general()
             self.run_example()
 
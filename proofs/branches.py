@@ -9,14 +9,19 @@ from membuild import MemBuild
 
 
 class ProofBranchBase(ProofOverTicks):
+    UNITS = ["address_adder"]
+
     def op_branch(self) -> OpBranch: 
         raise Exception("Not implemented in the child class")
     def run_general(self): 
         raise Exception("Not implemented in the child class")
 
+    def main_condition(self):
+        return self.time[1].at_instruction_start() & self.time[1].btype.match(opcode=Opcode.Branch, funct3=self.op_branch())
+
     def run_main_proof(self):
         m = self.module
-        with m.If(self.time[1].at_instruction_start() & self.time[1].btype.match(opcode=Opcode.Branch, funct3=self.op_branch())):
+        with m.If(self.main_condition()):
             self.run_general()
             self.run_example()
             self.time[0].assert_same_gpr(
@@ -7,6 +7,8 @@ from typing import List
 from membuild import MemBuild
 
 class ProofJal(ProofOverTicks): 
+    UNITS = ["address_adder"]
+
     def __init__(self):
         super().__init__(1)
 
@@ -16,6 +18,9 @@ class ProofJal(ProofOverTicks):
         return []
 
 
+    def main_condition(self):
+        return self.time[1].at_instruction_start() & self.time[1].jtype.match(opcode=Opcode.Jal)
+
     def run_main_proof(self):
         m = self.module
         with m.If(self.time[1].at_instruction_start()):
@@ -7,6 +7,8 @@ from typing import List
 from membuild import MemBuild
 
 class ProofJalr(ProofOverTicks): 
+    UNITS = ["address_adder"]
+
     def __init__(self):
         super().__init__(1)
 
@@ -16,6 +18,10 @@ class ProofJalr(ProofOverTicks):
         return []
 
 
+    def main_condition(self):
+        last = self.time[1]
+        return last.at_instruction_start() & last.itype.match(opcode=Opcode.Jalr) & (last.itype.funct3 == 0)
+
     def run_main_proof(self):
         m = self.module
         with m.If(self.time[1].at_instruction_start()):
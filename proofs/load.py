@@ -8,6 +8,7 @@ from membuild import MemBuild
 
 class ProofLoadBase(ProofOverTicks): 
     MAX_DELAY=5   
+    UNITS = ["address_adder"]
 
     def match(self, rv:Value, input:Value) -> Value:
         """ Return true if value in rv matches to what was in input """
@@ -24,12 +25,16 @@ class ProofLoadBase(ProofOverTicks):
             return [uut.in_reset, uut.clock.rst]
         return []
 
+    def main_condition(self):
+        first = self.time[ProofLoadBase.MAX_DELAY]
+        return first.at_instruction_start() & first.itype.match(opcode=Opcode.Load, funct3=self.op_load())
+
     def run_main_proof(self):        
         first = self.time[ProofLoadBase.MAX_DELAY]
         m : Module = self.module
         comb = m.d.comb
 
-        with m.If(first.at_instruction_start() & first.itype.match(opcode=Opcode.Load, funct3=self.op_load())):
+        with m.If(self.main_condition()):
             check_only = None
             #check_only = 3
 
@@ -53,7 +58,7 @@ class ProofLoadBase(ProofOverTicks):
                         with m.If(first.itype.rd == 0):
                             comb += Assert(next.r[0] == 0)
                         with m.Else():
-                            self.match(next.r[first.itype.rd], now.input_data[0])
+                            self.match(next.r[first.itype.rd], now.input_value)
                         
                 
     def previously_no_data_arrived(self, currenct_time):
@@ -7,6 +7,8 @@ from typing import List
 from membuild import MemBuild
 
 class ProofLui(ProofOverTicks): 
+    UNITS = []
+
     def __init__(self):
         super().__init__(1)
 
@@ -16,9 +18,12 @@ class ProofLui(ProofOverTicks):
         return []
 
 
+    def main_condition(self):
+        return self.time[1].at_instruction_start() & (self.time[1].utype.opcode == Opcode.Lui)
+
     def run_main_proof(self):
         m = self.module
-        with m.If(self.time[1].at_instruction_start() & (self.time[1].utype.opcode == Opcode.Lui)):
+        with m.If(self.main_condition()):
             self.run_general()
             self.run_example()
 
@@ -6,6 +6,8 @@ from core import Core
 from typing import List
 
 class ProofOppImm(ProofOverTicks): 
+    UNITS = ["alu", "shifter"]
+
     def __init__(self):
         super().__init__(1)
 
@@ -14,6 +16,10 @@ class ProofOppImm(ProofOverTicks):
             return [uut.in_reset, uut.clock.rst]
         return []
 
+    def main_condition(self):
+        last = self.time[1]
+        return self.additional_check() & last.at_instruction_start() & last.itype.match(opcode=Opcode.OpImm, funct3=self.funct3())
+
     def run_main_proof(self):        
         self.run_general()
         self.run_example()
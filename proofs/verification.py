@@ -1,55 +1,169 @@
-from nmigen import Module, Value, Signal, Const, Array
-from nmigen.asserts import Assert, Past
+from functools import cached_property
+from nmigen import Module, Value, Signal, Const, Array, Mux
+from nmigen.asserts import Assert, Cover, Past
+from nmigen.hdl.ast import ValueKey
 from core import Core
+from cache import ReadCache
 from register_file import RegisterFile
 from typing import Optional, List
 from encoding import IType, JType, UType, BType
 from skeleton import SeqPast
 
+SBY_CONFIG_TEMPLATE = """[tasks]
+bmc
+prove
+pdr
+cover
+
+[options]
+bmc: mode bmc
+prove: mode prove
+pdr: mode prove
+cover: mode cover
+depth {depth}
+multiclock off
+
+[engines]
+{engines}
+pdr: abc pdr
+
+[script]
+read_ilang {il_file}
+prep -top top
+
+[files]
+{il_file}
+"""
+
+class PastRegisterFile:
+    """ GPRs and pc of the core `past` ticks back. Every register is captured on first use,
+        indexing by Value needs all of them and the lookup is shared by every read with the same index """
+    def __init__(self, m:Module, core:Core, past:int, prefix:str):
+        self.module = m
+        self.core = core
+        self.past = past
+        self.prefix = prefix
+        self.gprs = {}
+        self.array = None
+        self.lookups = {}
+        self._pc = None
+
+    def main_gpr_count(self):
+        return RegisterFile.N
+
+    def gpr(self, i:int) -> Signal:
+        if i not in self.gprs:
+            self.gprs[i] = Signal(self.core.xlen, name=f"{self.prefix}_x{i}")
+            self.module.d.comb += self.gprs[i].eq(Past(self.core.register_file.r[i], self.past))
+        return self.gprs[i]
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self.gpr(key)
+        key = Value.cast(key)
+        if ValueKey(key) not in self.lookups:
+            if self.array is None:
+                self.array = Array([self.gpr(i) for i in range(RegisterFile.N)])
+            lookup = Signal(self.core.xlen, name=f"{self.prefix}_x_at_{len(self.lookups)}")
+            self.module.d.comb += lookup.eq(self.array[key])
+            self.lookups[ValueKey(key)] = lookup
+        return self.lookups[ValueKey(key)]
+
+    @property
+    def pc(self) -> Signal:
+        if self._pc is None:
+            self._pc = Signal(self.core.xlen, name=f"{self.prefix}_pc")
+            self.module.d.comb += self._pc.eq(Past(self.core.pc, self.past))
+        return self._pc
+
+
 class VerificationRegisterFile:
+    """ State of the core `past` ticks back. Fields are captured through Past on first use,
+        so RTLIL of the proof has only what it reads """
     def capture(self, m:Core, core:Core, past:int):
-        comb = m.d.comb
+        assert hasattr(core.register_file, "r"), "proofs need register file with GPRs in signals"
+        self.module = m
+        self.core = core
+        self.past = past
         if past > 0:
-            prefix=f"past{past}"
+            self.prefix=f"past{past}"
         else:
-            prefix="now"
-        self.r = RegisterFile(core.xlen, prefix=prefix)
-        for i in range(self.r.main_gpr_count()):
-            comb += self.r[i].eq(Past(core.register_file.r[i], past))
-        comb += self.r.pc.eq(Past(core.pc, past))
+            self.prefix="now"
+        self.r = PastRegisterFile(m, core, past, self.prefix)
 
-        # TODO: move to additional structure
-        self.itype = IType(prefix=f"{prefix}_i")        
-        self.itype.elaborate(comb, Past(core.current_instruction, past))
+    def sampled(self, value:Value, name:str) -> Signal:
+        """ Signal with value `past` ticks back """
+        signal = Signal.like(value, name=f"{self.prefix}_{name}")
+        self.module.d.comb += signal.eq(Past(value, self.past))
+        return signal
 
-        self.jtype = JType(prefix=f"{prefix}_j")
-        self.jtype.elaborate(comb, Past(core.current_instruction, past))
+    def decoded(self, decoder):
+        decoder.elaborate(self.module.d.comb, Past(self.core.current_instruction, self.past))
+        return decoder
 
-        self.utype = UType(prefix=f"{prefix}_u")
-        self.utype.elaborate(comb, Past(core.current_instruction, past))
+    # TODO: move to additional structure
+    @cached_property
+    def itype(self) -> IType:
+        return self.decoded(IType(prefix=f"{self.prefix}_i"))
 
-        self.btype = BType(prefix=f"{prefix}_b")
-        self.btype.elaborate(comb, Past(core.current_instruction, past))
+    @cached_property
+    def jtype(self) -> JType:
+        return self.decoded(JType(prefix=f"{self.prefix}_j"))
 
-        # TODO: membus
-        self.input_ready = Signal.like(core.mem2core.ready, name=f"{prefix}_input_ready")       
-        self.input_data = Array([Signal(core.xlen, name=f"{prefix}_input_{i}") for i in range(core.look_ahead)])
-        
-        self.cycle = Signal.like(core.cycle, name=f"{prefix}_cycle")
-        comb += self.cycle.eq(Past(core.cycle, past))
-
-        # TODO: move to structure
-        self.mem2core_addr = Signal.like(core.mem2core.addr, name=f"{prefix}_mem2core_addr")
-        self.mem2core_en = Signal.like(core.mem2core.en, name=f"{prefix}_mem2core_en")
-        self.mem2core_seq = Signal.like(core.mem2core.seq, name=f"{prefix}_mem2core_seq")
-        comb += self.mem2core_addr.eq(Past(core.mem2core.addr, past))
-        comb += self.mem2core_en.eq(Past(core.mem2core.en, past))
-        comb += self.mem2core_seq.eq(Past(core.mem2core.seq, past))
-        comb += self.input_ready.eq(Past(core.mem2core.ready, past))        
-        comb += self.input_data[0].eq(Past(core.mem2core.value, past))
+    @cached_property
+    def utype(self) -> UType:
+        return self.decoded(UType(prefix=f"{self.prefix}_u"))
+
+    @cached_property
+    def btype(self) -> BType:
+        return self.decoded(BType(prefix=f"{self.prefix}_b"))
+
+    # TODO: membus
+    @cached_property
+    def input_ready(self) -> Signal:
+        return self.sampled(self.core.mem2core.ready, "input_ready")
+
+    @cached_property
+    def input_value(self) -> Signal:
+        """ Word on mem2core, e.g. data of load once input_ready is set """
+        return self.sampled(self.core.mem2core.value, "input_value")
+
+    @cached_property
+    def input_data(self) -> Array:
+        """ Look-ahead words from pc: input_data[0] is the instruction that starts when instruction_started is set,
+            input_data[i] is the word at pc+4*i. With prefetch buffer it's in buffer slot i or on mem2core if buffer ends there """
+        core = self.core
+        words = []
+        for i in range(core.look_ahead):
+            if i < core.prefetch_depth:
+                words.append(Mux(core.prefetch_count > i, core.prefetch_data[i], core.mem2core.value))
+            else:
+                words.append(core.mem2core.value)
+        return Array([self.sampled(word, f"input_{i}") for i, word in enumerate(words)])
+
+    @cached_property
+    def instruction_started(self) -> Signal:
+        return self.sampled(self.core.instruction_started, "instruction_started")
+
+    @cached_property
+    def cycle(self) -> Signal:
+        return self.sampled(self.core.cycle, "cycle")
+
+    # TODO: move to structure
+    @cached_property
+    def mem2core_addr(self) -> Signal:
+        return self.sampled(self.core.mem2core.addr, "mem2core_addr")
+
+    @cached_property
+    def mem2core_en(self) -> Signal:
+        return self.sampled(self.core.mem2core.en, "mem2core_en")
+
+    @cached_property
+    def mem2core_seq(self) -> Signal:
+        return self.sampled(self.core.mem2core.seq, "mem2core_seq")
 
     def at_instruction_start(self):
-        return (self.cycle == 0) & (self.input_ready[0])
+        return self.instruction_started
 
     def assert_loading_from (self, m:Core, addr, src_loc_at=1):
         comb = m.d.comb
@@ -88,8 +202,26 @@ class VerificationRegisterFile:
         comb += Assert(self.r.pc == previous.pc, src_loc_at=src_loc_at)
 
 class ProofOverTicks:
+    # sby engine and solver of bmc and k-induction, pdr always runs `abc pdr`
+    ENGINE = "smtbmc"
+    SOLVER = "z3"
+    # steps before the first window of ticks+1 states: the state with in_reset set
+    RESET_STEPS = 1
+    # steps between reset and the window, instructions run there fill GPRs with values the window checks
+    WARMUP_STEPS = 4
+    # depth of the configs before it was computed from ticks, no proof gets less
+    MIN_DEPTH = 8
+    # rv.py --prune builds core only with these: class names of instructions the proof runs
+    # (None for the instruction the proof belongs to) and units of Core.UNITS they call
+    INSTRUCTIONS : Optional[List[str]] = None
+    UNITS : List[str] = Core.UNITS
+
     def __init__(self, ticks:int):
         self.ticks = ticks 
+        # rv.py --warmup overrides it
+        self.warmup = self.WARMUP_STEPS
+        # I-cache of the core (rv.py --icache): warm-up and the window wait for its refills
+        self.icache : Optional[ReadCache] = None
         self.time : List[VerificationRegisterFile] = [] #n-th element corresponts to state n ticks backs
         self.uut : Optional[Core] = None
         self.module : Optional[Core] = None
@@ -97,9 +229,15 @@ class ProofOverTicks:
     def run(self, m : Core, uut : Core):
         self.uut = uut
         self.module = m
+        # k-induction needs them, BMC just checks them along the way
+        uut.assert_invariants(m)
+        # fields are captured on first use, that may be inside m.If, so they go to separate module.
+        # All of them share one module, so Past of the same signal shares one chain of registers
+        history = Module()
+        m.submodules += history
         for i in range(self.ticks+1):
             regs = VerificationRegisterFile()
-            regs.capture(m, uut, i)
+            regs.capture(history, uut, i)
             self.time.append(regs)
 
         for i in range(self.ticks):
@@ -114,12 +252,18 @@ class ProofOverTicks:
 
         with m.If(no_resets):
             self.run_main_proof()
+            # cover task fails if no trace reaches it, then the main proof checks nothing
+            m.d.comb += Cover(self.main_condition())
 
         self.run_proof_no_aux_signals()
     
     def run_main_proof(self):
         pass
 
+    def main_condition(self) -> Value:
+        """ Condition the main proof checks something under, e.g. its instruction starts at the beginning of the window """
+        return self.time[self.ticks].at_instruction_start()
+
     def run_proof_no_aux_signals(self):
         """ Proof that is run without checking for any signals in sequences from signals_expectation(x) """
         pass
@@ -132,6 +276,26 @@ class ProofOverTicks:
 
 
 
+    @classmethod
+    def needs_instruction(cls, instruction : 'Instruction') -> bool:
+        if cls.INSTRUCTIONS is None:
+            return cls in (instruction.proofs() or [])
+        return type(instruction).__name__ in cls.INSTRUCTIONS
+
+    def depth(self) -> int:
+        """ Steps of BMC (and length of k-induction) that fit reset, warm-up and one full window of the proof """
+        steps = self.RESET_STEPS + self.warmup + self.ticks + 1
+        if self.icache is not None:
+            # every line instructions of warm-up and the first one of the window come from may miss
+            steps += self.icache.refill_cycles() * self.icache.lines_spanned(4 * (self.warmup + 1))
+        return max(self.MIN_DEPTH, steps)
+
+    def sby_config(self, il_file : str = "top.il", solvers : Optional[List[str]] = None) -> str:
+        """ sby config of the proof with tasks bmc, prove (k-induction), pdr and cover. Task must be given to sby.
+            Several solvers make a portfolio: sby runs an engine per solver at once and the first answer wins """
+        engines = "\n".join(f"{task}: {self.ENGINE} {solver}" for task in ["bmc", "prove", "cover"] for solver in solvers or [self.SOLVER])
+        return SBY_CONFIG_TEMPLATE.format(depth=self.depth(), engines=engines, il_file=il_file)
+
     def run_tick_proof(self, steps_back : int):
         """ Utility function for proofs that might require different proves over different times """
         pass
@@ -0,0 +1,336 @@
+#!/usr/bin/python3
+""" Run formal proofs of the core in parallel, skipping the ones that already passed.
+
+    For every proof RTLIL and sby config are generated by `rv.py --proof NAME --sby NAME.sby generate`.
+    Proof is identified by sha256 of its top.il, sby config without engines and task, so any change of the core, an
+    instruction or the config reruns it, and nothing else does. Every proof runs in test_results/proofs/NAME-MODE-HASH, at most
+    --jobs proofs at once. Results (status, wall time) are kept in the JSON ledger, proofs with
+    hash that already passed are skipped.
+
+    --modes runs every proof in several flows, they are tasks of its config: bmc, prove - k-induction,
+    pdr - abc pdr and cover - reachability of the main proof condition, so a proof that checks nothing fails.
+    bmc and cover run by default. Solve time of every mode is reported next to bmc, cached results are
+    reported with the time they took when they ran.
+
+    Arguments prove.py doesn't know are passed to rv.py:
+        ./prove.py --jobs 4 lw lh -- --icache 64:16:2
+        ./prove.py --modes bmc,prove,pdr
+
+    --solvers z3,boolector,yices races the solvers: sby runs an engine per solver at once, the first
+    answer wins and the winner is kept in the ledger. --solvers auto takes the last winner of the proof,
+    or races PORTFOLIO if there is none yet.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SBY_STATUSES = ["PASS", "FAIL", "UNKNOWN", "TIMEOUT", "ERROR"]
+# sby tasks of ProofOverTicks.sby_config()
+MODES = ["bmc", "prove", "pdr", "cover"]
+# smtbmc solvers --solvers auto races when no winner is known
+PORTFOLIO = ["z3", "boolector", "yices"]
+# `summary: engine_1 (smtbmc boolector) returned pass`, prove mode adds ` for basecase` or ` for induction`
+ENGINE_SUMMARY_RE = re.compile(r"summary: (engine_\d+) \((.+?)\) returned (pass|fail)", re.IGNORECASE)
+# `engine_1: Status returned by engine for induction: pass`, logged when the engine answers
+ENGINE_STATUS_RE = re.compile(r"(engine_\d+): Status returned by engine(?: for \w+)?: (pass|fail)", re.IGNORECASE)
+
+
+class Ledger:
+    """ Proof results by hash, saved after every update so interrupted runs keep what they finished """
+    def __init__(self, path : str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries : Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def passed(self, digest : str) -> bool:
+        with self.lock:
+            return self.entries.get(digest, {}).get("status") == "PASS"
+
+    def wall_time(self, digest : str) -> float:
+        with self.lock:
+            return self.entries.get(digest, {}).get("wall_time", 0.0)
+
+    def engine(self, digest : str, proof : str, mode : str, rv_args : List[str]) -> Optional[str]:
+        """ Engine that won the proof last time. If this hash never ran, the last winner of the same proof """
+        with self.lock:
+            entry = self.entries.get(digest)
+            if entry and entry.get("engine"):
+                return entry["engine"]
+            same = [entry for entry in self.entries.values() if entry.get("engine") and entry.get("proof") == proof
+                and entry.get("mode", "bmc") == mode and entry.get("rv_args") == rv_args]
+            return max(same, key=lambda entry: entry["finished"])["engine"] if same else None
+
+    def record(self, digest : str, entry : dict):
+        with self.lock:
+            self.entries[digest] = entry
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.entries, f, indent=2, sort_keys=True)
+            os.replace(tmp, self.path)
+
+
+def generate_config(name : str, rv_args : List[str], out_dir : str, solvers : List[str]) -> bytes:
+    """ Return sby config of the proof with engines of the solvers """
+    with tempfile.TemporaryDirectory(dir=out_dir) as staging:
+        sby_path = os.path.join(staging, f"{name}.sby")
+        cmd = [sys.executable, os.path.join(HERE, "rv.py"), "--proof", name, "--sby", sby_path, "--sby-solvers", ",".join(solvers)] + rv_args
+        subprocess.run(cmd, check=True, cwd=HERE, stdout=subprocess.DEVNULL)
+        with open(sby_path, "rb") as sby:
+            return sby.read()
+
+def config_key(config : bytes) -> bytes:
+    """ Config without [engines] section: whichever engine answers, the answer is the same """
+    lines = []
+    in_engines = False
+    for line in config.splitlines():
+        if line.startswith(b"["):
+            in_engines = line.strip() == b"[engines]"
+        if not in_engines:
+            lines.append(line)
+    return b"\n".join(lines)
+
+def generate_rtlil(name : str, rv_args : List[str], out_dir : str) -> Tuple[bytes, bytes]:
+    """ Return top.il and sby config of the proof """
+    with tempfile.TemporaryDirectory(dir=out_dir) as staging:
+        il_path = os.path.join(staging, "top.il")
+        sby_path = os.path.join(staging, f"{name}.sby")
+        cmd = [sys.executable, os.path.join(HERE, "rv.py"), "--proof", name, "--sby", sby_path] + rv_args + ["generate", "-t", "il", il_path]
+        subprocess.run(cmd, check=True, cwd=HERE, stdout=subprocess.DEVNULL)
+        with open(il_path, "rb") as f, open(sby_path, "rb") as sby:
+            return f.read(), sby.read()
+
+
+class RvCache:
+    """ Whatever rv.py generates is generated once, however many jobs need it """
+    def __init__(self, rv_args : List[str], out_dir : str):
+        self.rv_args = rv_args
+        self.out_dir = out_dir
+        self.lock = threading.Lock()
+        self.locks : Dict[tuple, threading.Lock] = {}
+        self.results : Dict[tuple, Union[bytes, Tuple[bytes, bytes], Exception]] = {}
+
+    def rtlil(self, name : str) -> Tuple[bytes, bytes]:
+        """ top.il and default sby config of the proof """
+        return self.get(("rtlil", name), lambda: generate_rtlil(name, self.rv_args, self.out_dir))
+
+    def config(self, name : str, solvers : List[str]) -> bytes:
+        return self.get(("config", name, tuple(solvers)), lambda: generate_config(name, self.rv_args, self.out_dir, solvers))
+
+    def get(self, key : tuple, generate : Callable):
+        with self.lock:
+            key_lock = self.locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self.results:
+                try:
+                    self.results[key] = generate()
+                except subprocess.CalledProcessError as e:
+                    self.results[key] = e
+        result = self.results[key]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class ProofJob:
+    def __init__(self, name : str, rv_args : List[str], config : Optional[str], out_dir : str, mode="bmc", solvers=None):
+        self.name = name
+        # sby task to run
+        self.mode = mode
+        # solvers to race, "auto" or None for the solver of the proof
+        self.solvers : Union[List[str], str, None] = solvers
+        # engine that answered first
+        self.engine : Optional[str] = None
+        self.rv_args = rv_args
+        # sby config to use instead of the one rv.py writes for the proof
+        self.config = config
+        self.out_dir = out_dir
+        self.digest : Optional[str] = None
+        self.status : Optional[str] = None
+        self.wall_time = 0.0
+        self.work_dir : Optional[str] = None
+
+    def generate(self, rv : RvCache) -> Tuple[bytes, bytes]:
+        """ Get RTLIL and sby config of the proof and compute its hash """
+        il, config = rv.rtlil(self.name)
+        if self.config:
+            with open(self.config, "rb") as f:
+                config = f.read()
+        self.digest = hashlib.sha256(il + b"\0" + config_key(config) + b"\0" + self.mode.encode()).hexdigest()
+        return il, config
+
+    def choose_solvers(self, ledger : Ledger) -> Optional[List[str]]:
+        """ Resolve "auto" to the last winner or to PORTFOLIO. pdr has no solvers to choose """
+        if self.mode == "pdr" or self.solvers != "auto":
+            return None if self.mode == "pdr" else self.solvers
+        engine = ledger.engine(self.digest, self.name, self.mode, self.rv_args)
+        if engine and engine.startswith("smtbmc "):
+            return [engine.split()[-1]]
+        return PORTFOLIO
+
+    def run(self, il : bytes, config : bytes, sby : str):
+        """ Run sby in fresh work dir """
+        self.work_dir = os.path.join(self.out_dir, f"{self.name}-{self.mode}-{self.digest[:12]}")
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        os.makedirs(self.work_dir)
+        with open(os.path.join(self.work_dir, "top.il"), "wb") as f:
+            f.write(il)
+        with open(os.path.join(self.work_dir, f"{self.name}.sby"), "wb") as f:
+            f.write(config)
+
+        start = time.perf_counter()
+        with open(os.path.join(self.work_dir, "sby.log"), "w") as log:
+            result = subprocess.run([sby, "-f", f"{self.name}.sby", self.mode], cwd=self.work_dir, stdout=log, stderr=subprocess.STDOUT)
+        self.wall_time = time.perf_counter() - start
+        self.status = self.read_status(result.returncode)
+        self.engine = self.read_engine()
+
+    def read_status(self, returncode : int) -> str:
+        """ sby leaves PASS/FAIL/... file in every task dir, worst of them wins """
+        found = set()
+        for entry in os.listdir(self.work_dir):
+            task_dir = os.path.join(self.work_dir, entry)
+            if os.path.isdir(task_dir):
+                found |= {status for status in SBY_STATUSES if os.path.exists(os.path.join(task_dir, status))}
+        for status in reversed(SBY_STATUSES):
+            if status in found:
+                return status
+        return "PASS" if returncode == 0 else "ERROR"
+
+    def read_engine(self) -> Optional[str]:
+        """ Engine that answered last. In prove mode basecase and induction can be answered by different
+            engines, the one of the slower phase decides solve time, so it is the one to keep """
+        with open(os.path.join(self.work_dir, "sby.log")) as log:
+            text = log.read()
+        engines = {summary.group(1): summary.group(2) for summary in ENGINE_SUMMARY_RE.finditer(text)}
+        answered = [status.group(1) for status in ENGINE_STATUS_RE.finditer(text) if status.group(1) in engines]
+        if answered:
+            return engines[answered[-1]]
+        return next(iter(engines.values()), None)
+
+    def ledger_entry(self) -> dict:
+        return {
+            "proof": self.name,
+            "mode": self.mode,
+            "status": self.status,
+            "wall_time": round(self.wall_time, 3),
+            "engine": self.engine,
+            "solvers": self.solvers,
+            "rv_args": self.rv_args,
+            "config": os.path.relpath(self.config, HERE) if self.config else "rv.py",
+            "work_dir": os.path.relpath(self.work_dir, HERE),
+            "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+
+
+def list_proofs(rv_args : List[str]) -> List[str]:
+    result = subprocess.run([sys.executable, os.path.join(HERE, "rv.py"), "--list-proofs"] + rv_args,
+        check=True, cwd=HERE, stdout=subprocess.PIPE, text=True)
+    return result.stdout.split()
+
+def run_job(job : ProofJob, rv : RvCache, ledger : Ledger, sby : str, force : bool) -> ProofJob:
+    try:
+        il, config = job.generate(rv)
+        if not force and ledger.passed(job.digest):
+            job.status = "CACHED"
+            job.wall_time = ledger.wall_time(job.digest)
+            job.engine = ledger.engine(job.digest, job.name, job.mode, job.rv_args)
+            return job
+        job.solvers = job.choose_solvers(ledger)
+        if job.solvers:
+            config = rv.config(job.name, job.solvers)
+    except subprocess.CalledProcessError:
+        # nothing to hash, so nothing goes to the ledger
+        job.status = "GENERATE-ERROR"
+        return job
+    job.run(il, config, sby)
+    ledger.record(job.digest, job.ledger_entry())
+    return job
+
+
+def print_comparison(jobs : List[ProofJob], modes : List[str]):
+    """ Solve time of every mode of every proof, relative to bmc if it ran """
+    by_proof : Dict[str, Dict[str, ProofJob]] = {}
+    for job in jobs:
+        by_proof.setdefault(job.name, {})[job.mode] = job
+    print(f"{'proof':8} " + " ".join(f"{mode:>18}" for mode in modes))
+    for name, proof_jobs in by_proof.items():
+        bmc = proof_jobs.get("bmc")
+        cells = []
+        for mode in modes:
+            job = proof_jobs[mode]
+            cell = f"{job.wall_time:.1f}s"
+            if job.status not in ["PASS", "CACHED"]:
+                cell = f"{job.status} {cell}"
+            elif mode != "bmc" and bmc is not None and bmc.wall_time > 0:
+                cell = f"{cell} x{job.wall_time / bmc.wall_time:.2f}"
+            cells.append(f"{cell:>18}")
+        print(f"{name:8} " + " ".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="run formal proofs of the core")
+    parser.add_argument("proofs", nargs="*", help="proofs to run, all of them by default")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count(), help="number of proofs running at once")
+    parser.add_argument("--config", type=str, help="sby config to use instead of the one rv.py writes for the proof, it reads top.il and has task of every mode")
+    parser.add_argument("--modes", type=str, default="bmc,cover", help=f"comma separated modes to run: {', '.join(MODES)}")
+    parser.add_argument("--out-dir", type=str, default=os.path.join(HERE, "test_results", "proofs"), help="where work dirs are created")
+    parser.add_argument("--ledger", type=str, help="JSON ledger, OUT_DIR/ledger.json by default")
+    parser.add_argument("--sby", type=str, default="sby", help="sby executable")
+    parser.add_argument("--force", action="store_true", help="run proofs even if they already passed")
+    parser.add_argument("--solvers", type=str, help="comma separated smtbmc solvers to race, or auto to take the last winner of every proof")
+    argv = sys.argv[1:]
+    rv_args = []
+    if "--" in argv:
+        rv_args = argv[argv.index("--") + 1:]
+        argv = argv[:argv.index("--")]
+    args, unknown = parser.parse_known_args(argv)
+    rv_args = unknown + rv_args
+
+    out_dir = os.path.abspath(args.out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    ledger = Ledger(args.ledger or os.path.join(out_dir, "ledger.json"))
+    modes = args.modes.split(",")
+    unknown_modes = [mode for mode in modes if mode not in MODES]
+    if unknown_modes:
+        parser.error(f"unknown modes {unknown_modes}, expected some of {list(MODES)}")
+    if args.solvers and args.config:
+        parser.error("--solvers go to config rv.py writes, they can't be used with --config")
+    solvers = args.solvers if args.solvers in [None, "auto"] else args.solvers.split(",")
+    names = args.proofs or list_proofs(rv_args)
+    rv = RvCache(rv_args, out_dir)
+    jobs = []
+    for name in names:
+        for mode in modes:
+            jobs.append(ProofJob(name, rv_args, args.config and os.path.abspath(args.config), out_dir, mode, solvers))
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = [pool.submit(run_job, job, rv, ledger, args.sby, args.force) for job in jobs]
+        for future in futures:
+            job = future.result()
+            print(f"{job.name:8} {job.mode:6} {job.status:8} {job.wall_time:8.1f}s  {(job.digest or '')[:12]}  {job.engine or ''}")
+            if job.status not in ["PASS", "CACHED"]:
+                failed.append(f"{job.name}:{job.mode}" if len(modes) > 1 else job.name)
+
+    if len(modes) > 1:
+        print_comparison(jobs, modes)
+    if failed:
+        print(f"failed: {' '.join(failed)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from nmigen import Signal, Array, Module
+from nmigen import Signal, Array, Module, Memory
 from nmigen.build import Platform
 from skeleton import ElaboratableAbstract
 
@@ -43,19 +43,58 @@ class RegisterFileModule(ElaboratableAbstract):
             iclk += self.r[self.rd].eq(self.rd_value)
 
         return m
-    
 
-from nmigen.cli import main as nmigen_main
+
+class RegisterFileMemoryModule(ElaboratableAbstract):
+    """ RegisterFileModule built on nmigen Memory with two asynchronous read ports and one write port.
+        x0 is zero as memory is initialized with zeros and x0 is never written.
+        GPRs are not separate signals, so proofs that look at them need RegisterFileModule """
+    def __init__(self, xlen):
+        super().__init__()
+        self.rs1_in = self.add_input_signal(5, name="rs1_in")
+        self.rs2_in = self.add_input_signal(5, name="rs2_in")
+        self.rs1_out = self.add_output_signal(xlen, name="rs1_out")
+        self.rs2_out = self.add_output_signal(xlen, name="rs2_out")
+
+        self.rd = self.add_input_signal(5, name="rd")
+        self.rd_value = self.add_input_signal(xlen, name="rd_value")
+
+        self.memory = Memory(width=xlen, depth=RegisterFile.N, name="gpr")
+
+    def elaborate(self, p:Platform)->Module:
+        m = Module()
+        comb = m.d.comb
+        m.submodules.rs1 = rs1 = self.memory.read_port(domain="comb")
+        m.submodules.rs2 = rs2 = self.memory.read_port(domain="comb")
+        m.submodules.rd = rd = self.memory.write_port(domain="i")
+
+        comb += rs1.addr.eq(self.rs1_in)
+        comb += rs2.addr.eq(self.rs2_in)
+        comb += self.rs1_out.eq(rs1.data)
+        comb += self.rs2_out.eq(rs2.data)
+
+        comb += rd.addr.eq(self.rd)
+        comb += rd.data.eq(self.rd_value)
+        comb += rd.en.eq(self.rd != 0)
+
+        return m
+
+
+from nmigen.cli import main_parser, main_runner
 from nmigen.asserts import Assert, Past
 from skeleton import dump_inputs
 from clock_info import ClockInfo
 
 def __main():
+    parser = main_parser()
+    parser.add_argument("--memory", action="store_true", help="check RegisterFileMemoryModule")
+    args = parser.parse_args()
+
     m = top = Module()
     clock = ClockInfo("i")
     m.domains.i = clock.domain
 
-    top.submodules.regs = regs = RegisterFileModule(32)
+    top.submodules.regs = regs = RegisterFileMemoryModule(32) if args.memory else RegisterFileModule(32)
     regs.aux_ports.append(clock.clk)
     regs.aux_ports.append(clock.rst)
     
@@ -75,7 +114,7 @@ def __main():
             comb += Assert(regs.rs1_out == Past(regs.rd_value))
 
 
-    nmigen_main(top, ports=regs.ports())
+    main_runner(parser, args, top, ports=regs.ports())
 
 
 
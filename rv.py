@@ -1,5 +1,6 @@
 from nmigen import Module, Signal, ClockSignal, ClockDomain
 from nmigen.cli import main_parser, main_runner
+from nmigen.hdl.ir import UnusedElaboratable
 
 from core import Core
 
@@ -10,67 +11,154 @@ from instructions.lui import LuiInstr
 from instructions.auipc import AuipcInstr
 from instructions.branches import BeqBneInstr, BltBgeInstr, BltuBgeuInstr
 from instructions.load import LbLbuInstr, LhLhuInstr, LwInstr
+from instructions.other import OtherInstr
 
 from clock_info import ClockInfo
+import os
 import sys 
+import warnings
 import alu 
 from nmigen import ResetSignal
 
 from proofs.verification import ProofOverTicks
+from iss import ISS
 
 
 def main():
-    m = Module()
-    clock = ClockInfo("i")
-    m.domains.i = clock.domain
-    m.submodules.core = core = Core(clock)
-    core.aux_ports.append(clock.clk)
-    core.aux_ports.append(clock.rst)
-    
     parser = main_parser()
     parser.add_argument("--proof", type=str, help="generate signle proof")
+    parser.add_argument("--list-proofs", action="store_true", help="print names of all proofs and exit")
+    parser.add_argument("--sby", type=str, metavar="FILE", help="write sby config of the proof (depth, engines) to FILE, without generate nothing else is done")
+    parser.add_argument("--warmup", type=int, metavar="N", help="steps between reset and the window of the proof in its sby config (ProofOverTicks.WARMUP_STEPS by default)")
+    parser.add_argument("--sby-solvers", type=str, metavar="LIST", help="comma separated solvers of --sby config, several of them race")
+    parser.add_argument("--cycles", type=int, default=30, help="number of cycles to simulate (upper limit if halt condition is used)")
+    parser.add_argument("--halt-pc", type=lambda x: int(x, 0), help="stop simulation when pc reaches the address")
+    parser.add_argument("--halt-ebreak", action="store_true", help="stop simulation on EBREAK")
+    parser.add_argument("--halt-invalid", type=int, metavar="N", help="stop simulation after N invalid instructions in a row")
+    parser.add_argument("--no-trace", action="store_true", help="don't write VCD/GTKW files")
+    parser.add_argument("--trace", type=str, action="append", metavar="SIGNAL", help="write only this port of the core to VCD (may be repeated)")
+    parser.add_argument("--trace-window", type=str, metavar="FIRST:LAST", help="write VCD only for cycles FIRST..LAST")
+    parser.add_argument("--iss", type=int, metavar="N", help="run N instructions of proof program on instruction set simulator instead of RTL")
+    parser.add_argument("--dispatch", choices=["priority", "switch"], default="priority", help="how core selects instruction to execute")
+    parser.add_argument("--regfile", choices=["array", "memory"], default="array", help="register file implementation")
+    parser.add_argument("--adder", type=str, default="yosys", help="adder of ALU and address calculations: yosys or one of toolbox.adder.ADDERS")
+    parser.add_argument("--shifter", choices=["split", "unified"], default="split", help="separate left/right shifters or one shared shifter")
+    parser.add_argument("--look-ahead", type=int, default=1, metavar="N", help="number of instruction words core fetches ahead")
+    parser.add_argument("--bus-lanes", type=int, default=1, metavar="N", help="number of words mem2core can carry in one burst")
+    parser.add_argument("--icache", type=str, metavar="SIZE:LINE:WAYS", help="put instruction cache between core and memory")
+    parser.add_argument("--dcache", type=str, metavar="SIZE:LINE:WAYS", help="put data cache between core and memory")
+    parser.add_argument("--prune", action="store_true", help="when generating a proof, build core only with instructions and units the proof needs")
+    parser.add_argument("--mem-latency", type=int, default=0, metavar="N", help="cycles simulated memory needs to serve a read")
     args=parser.parse_args()
     required_proof = args.proof
 
-
     # RV32I
-    core.add_instruction(OpImmInstr())
-    core.add_instruction(JalrInstr())
-    core.add_instruction(JalInstr())
-    core.add_instruction(LuiInstr())
-    core.add_instruction(AuipcInstr())
-    core.add_instruction(BeqBneInstr())
-    core.add_instruction(BltBgeInstr())
-    core.add_instruction(BltuBgeuInstr())
-    core.add_instruction(LbLbuInstr())
-    core.add_instruction(LhLhuInstr())
-    core.add_instruction(LwInstr())
-    
-    proof_instance=None
-    generate_proof="generate" in sys.argv
+    instructions = [
+        OpImmInstr(),
+        JalrInstr(),
+        JalInstr(),
+        LuiInstr(),
+        AuipcInstr(),
+        BeqBneInstr(),
+        BltBgeInstr(),
+        BltuBgeuInstr(),
+        LbLbuInstr(),
+        LhLhuInstr(),
+        LwInstr(),
+    ]
     all_proofs = [proof 
-                    for instruction in core.instructions
+                    for instruction in instructions
                     for proof in instruction.proofs() ]
-    
-    if required_proof:
-        for proof_class in all_proofs:
-            proof_name = proof_class.__name__.lower()
-            if proof_name.startswith("proof"):
-                proof_name=proof_name[len("proof"):]            
-            
-            if required_proof == "ALL" or proof_name == required_proof:
-                proof_instance = proof_class()
-                if generate_proof:
-                    proof_instance.run(m, core)
-    if required_proof is not None and not proof_instance:
+
+    if args.list_proofs:
+        print("\n".join(proof_name(proof_class) for proof_class in all_proofs))
+        return
+
+    proof_classes = [proof_class for proof_class in all_proofs if required_proof in ["ALL", proof_name(proof_class)]]
+    if required_proof is not None and not proof_classes:
         raise Exception(f"Unknown proof {required_proof}")
+    generate_proof="generate" in sys.argv
+
+    if args.iss is not None and not generate_proof:
+        # ISS needs only the program, no core is built
+        assert proof_classes, "use --proof proof to run simulation from proof/instruction"
+        iss = ISS(proof_classes[-1]().simulate())
+        iss.run(args.iss)
+        iss.dump()
+        return
+
+    units = None
+    if args.prune and generate_proof:
+        assert proof_classes, "--prune needs --proof"
+        # everything proofs don't run is left to unconstrained OtherInstr
+        instructions = [instruction for instruction in instructions
+                        if any(proof_class.needs_instruction(instruction) for proof_class in proof_classes)]
+        instructions.append(OtherInstr())
+        units = sorted({unit for proof_class in proof_classes for unit in proof_class.UNITS})
+
+    m = Module()
+    clock = ClockInfo("i")
+    m.domains.i = clock.domain
+    m.submodules.core = core = Core(clock, look_ahead=args.look_ahead, bus_lanes=args.bus_lanes, dispatch=args.dispatch, regfile=args.regfile, adder=args.adder, shifter=args.shifter, units=units)
+    core.aux_ports.append(clock.clk)
+    core.aux_ports.append(clock.rst)
+    icache = None
+    if args.icache:
+        size, line, ways = (int(x, 0) for x in args.icache.split(":"))
+        icache = core.attach_icache(m, size, line, ways)
+    if args.dcache:
+        size, line, ways = (int(x, 0) for x in args.dcache.split(":"))
+        core.attach_dcache(m, size, line, ways)
+    for instruction in instructions:
+        core.add_instruction(instruction)
+
+    proof_instance=None
+    for proof_class in proof_classes:
+        proof_instance = proof_class()
+        if args.warmup is not None:
+            proof_instance.warmup = args.warmup
+        proof_instance.icache = icache
+        if generate_proof:
+            proof_instance.run(m, core)
+    if args.sby:
+        assert proof_instance, "--sby needs --proof"
+        il_file = os.path.basename(args.generate_file.name) if generate_proof and args.generate_file else "top.il"
+        solvers = args.sby_solvers.split(",") if args.sby_solvers else None
+        with open(args.sby, "w") as f:
+            f.write(proof_instance.sby_config(il_file, solvers))
+        if not generate_proof:
+            warnings.simplefilter("ignore", UnusedElaboratable)
+            return
         
 
     if "generate" in sys.argv:
         main_runner(parser, args, m, ports=core.ports())
     else:
         assert proof_instance, "use --proof proof to run simulation from proof/instruction"
-        core.simulate(m, clock, proof_instance.simulate())
+        trace = "all"
+        if args.no_trace:
+            trace = None
+        elif args.trace:
+            ports = {port.name : port for port in core.ports() if hasattr(port, "name")}
+            unknown = [name for name in args.trace if name not in ports]
+            if unknown:
+                raise Exception(f"Unknown ports to trace {unknown}, expected some of {list(ports)}")
+            trace = [ports[name] for name in args.trace]
+        trace_window = None
+        if args.trace_window:
+            trace_window = tuple(int(cycle, 0) for cycle in args.trace_window.split(":"))
+        stats = core.simulate(m, clock, proof_instance.simulate(), n=args.cycles,
+            halt_pc=args.halt_pc, halt_on_ebreak=args.halt_ebreak, halt_invalid_streak=args.halt_invalid,
+            trace=trace, trace_window=trace_window, mem_latency=args.mem_latency)
+        print(stats)
+
+
+def proof_name(proof_class) -> str:
+    """ Name of the proof for --proof: ProofLw -> lw """
+    name = proof_class.__name__.lower()
+    if name.startswith("proof"):
+        name = name[len("proof"):]
+    return name
 
 
 if __name__ == "__main__":
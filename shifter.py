@@ -1,19 +1,22 @@
 from typing import Union
 
-from nmigen import Module, Signal, Const, Cat, signed
+from nmigen import Module, Signal, Const, Cat, Mux, signed
 from nmigen.build import Platform
 from skeleton import ElaboratableAbstract
+from toolbox.bitreverse import BitReverse
 
 
 class Shifter(ElaboratableAbstract):
     LEFT="shl"
     RIGHT="shr"
+    # Shifts both ways with single right shifter: left shift is bit-reversed right shift of bit-reversed input
+    BOTH="sh"
 
     def __init__(self, xlen : int, direction : str, prefix=""):
         super().__init__()
         if prefix: prefix += "_"
         self.prefix = prefix
-        assert direction in [Shifter.LEFT, Shifter.RIGHT], "Direction may be only Shifter.LEFT or Shifter.RIGHT"
+        assert direction in [Shifter.LEFT, Shifter.RIGHT, Shifter.BOTH], "Direction may be only Shifter.LEFT, Shifter.RIGHT or Shifter.BOTH"
 
         self.direction = direction
         self.xlen = xlen 
@@ -21,8 +24,11 @@ class Shifter(ElaboratableAbstract):
 
         self.input = self.add_input_signal(xlen, name=f"{prefix}input")
         self.shamt = self.add_input_signal(xlen.bit_length() - 1, name=f"{prefix}shamt")
-        if direction == Shifter.RIGHT:
+        if direction in [Shifter.RIGHT, Shifter.BOTH]:
             self.msb = self.add_input_signal(name=f"{prefix}msb")
+        if direction == Shifter.BOTH:
+            # shift left if set, msb is ignored then
+            self.left = self.add_input_signal(name=f"{prefix}left")
 
         self.output = self.add_output_signal(xlen, name=f"{prefix}output")
 
@@ -33,8 +39,10 @@ class Shifter(ElaboratableAbstract):
             self.elaborate_left(m)
         elif self.direction == Shifter.RIGHT:
             self.elaborate_right(m)
+        elif self.direction == Shifter.BOTH:
+            self.elaborate_both(m)
         else:
-            assert False, "Invalid direction. Expected LEFT/RIGHT"
+            assert False, "Invalid direction. Expected LEFT/RIGHT/BOTH"
         return m
 
     def elaborate_left(self, m:Module):
@@ -78,6 +86,19 @@ class Shifter(ElaboratableAbstract):
          
 
         return
+
+    def elaborate_both(self, m:Module):
+        comb = m.d.comb
+        m.submodules.rev_in = rev_in = BitReverse(self.xlen)
+        m.submodules.rev_out = rev_out = BitReverse(self.xlen)
+        m.submodules.shr = shr = Shifter(self.xlen, Shifter.RIGHT, f"{self.prefix}r")
+
+        comb += rev_in.a.eq(self.input)
+        comb += shr.input.eq(Mux(self.left, rev_in.output, self.input))
+        comb += shr.shamt.eq(self.shamt)
+        comb += shr.msb.eq(self.msb & ~self.left)
+        comb += rev_out.a.eq(shr.output)
+        comb += self.output.eq(Mux(self.left, rev_out.output, shr.output))
 #
 # FORMAL VERIFICATION
 #     
@@ -125,11 +146,31 @@ def __verify_right(m):
     return shr.ports()
 
 
+def __verify_both(m):
+    """ Unified shifter is equivalent to separate left and right shifters """
+    m.submodules.sh = sh = Shifter(32, Shifter.BOTH, "sh")
+    m.submodules.ref_shl = ref_shl = Shifter(32, Shifter.LEFT, "ref_shl")
+    m.submodules.ref_shr = ref_shr = Shifter(32, Shifter.RIGHT, "ref_shr")
+    comb = m.d.comb
+
+    comb += ref_shl.input.eq(sh.input)
+    comb += ref_shl.shamt.eq(sh.shamt)
+    comb += ref_shr.input.eq(sh.input)
+    comb += ref_shr.shamt.eq(sh.shamt)
+    comb += ref_shr.msb.eq(sh.msb)
+    with m.If(sh.left):
+        comb += Assert(sh.output == ref_shl.output)
+    with m.Else():
+        comb += Assert(sh.output == ref_shr.output)
+    return sh.ports()
+
+
 def __main():
     m=Module()
     ports = []
     ports += __verify_left(m)
     ports += __verify_right(m)
+    ports += __verify_both(m)
     #comb += Cover((shl.input == 0x10203040) & (shl.shamt == 8))
     nmigen_main(m, ports=ports)
     
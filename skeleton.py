@@ -114,6 +114,46 @@ def fix_gtkw_win(fname):
     with open(fname, "w") as res:
         res.writelines(lines)
 
+class CycleTrace:
+    """ Lightweight waveform writer that samples chosen signals once per cycle.
+        Unlike Simulator.write_vcd it doesn't record every delta of every signal,
+        and may be enabled only for a window of cycles """
+    def __init__(self, signals : List[Signal], vcd_filename : str, gtkw_filename : str = None, window : Tuple[int, int] = None):
+        from vcd import VCDWriter
+        # ports may list the same signal twice
+        self.signals = list({id(signal) : signal for signal in signals}.values())
+        self.window = window
+        self.vcd_filename = vcd_filename
+        self.gtkw_filename = gtkw_filename
+        self.vcd_file = open(vcd_filename, "w")
+        self.writer = VCDWriter(self.vcd_file, timescale="1 us")
+        self.names = []
+        for signal in self.signals:
+            name = signal.name
+            while name in self.names:
+                name += "_"
+            self.names.append(name)
+        self.vars = [self.writer.register_var("top", name, "wire", size=signal.width) for name, signal in zip(self.names, self.signals)]
+
+    def sample(self, cycle : int):
+        """ Generator that samples all signals at `cycle` if it's inside of the window. Use `yield from` in sync process """
+        if self.window is not None and not (self.window[0] <= cycle <= self.window[1]):
+            return
+        for var, signal in zip(self.vars, self.signals):
+            self.writer.change(var, cycle, (yield signal))
+
+    def close(self):
+        self.writer.close()
+        self.vcd_file.close()
+        if self.gtkw_filename:
+            from vcd.gtkw import GTKWSave
+            with open(self.gtkw_filename, "w") as gtkw_file:
+                save = GTKWSave(gtkw_file)
+                save.dumpfile(self.vcd_filename)
+                for name in self.names:
+                    save.trace(f"top.{name}")
+
+
 def dump_inputs(from_module:Module, to_module : Module, prefix="", suffix="") -> List[Signal]:
     input_copies = []
     for signal in from_module.inputs():
@@ -138,6 +178,13 @@ def bit_slice(n : int, hi:int, lo:int):
     bits = shifted & mask
     return bits
 
+def sign_extend(n : int, bits : int):
+    """ interpret lower `bits` of n as two's complement number and return it as python int """
+    n = n & ((1 << bits) - 1)
+    if n >> (bits - 1):
+        n -= 1 << bits
+    return n
+
 def as_signed(m : Module, signal:Signal):
     """ Create a new copy of signal, but marked as signed """
     if signal.signed:
@@ -1,7 +1,7 @@
 import os
 import re
 import sys
-from typing import List
+from typing import List, Tuple, Optional
 
 from nmigen import Elaboratable, Module, Signal, signed, unsigned, Cat
 from nmigen.hdl.ast import Statement, Const
@@ -97,7 +97,7 @@ class RippleCarryAdder(AbstractAdder):
     def elaborate(self, platform : Platform = None):
         self.module = m = Module()        
 
-        last_carry = self.elaborate_range(m, self.input_width, 0, self.adder_step_impl)
+        last_carry = self.elaborate_range(m, self.input_width, self.carry0, self.adder_step_impl)
         m.d.comb += self.out[self.input_width].eq(last_carry)
 
         return m
@@ -121,5 +121,130 @@ class RippleCarryAdder(AbstractAdder):
         return "<toolbox.RippleCarryAdder%d>" % self.input_width
 
 
+class PrefixAdder(AbstractAdder):
+    """ Parallel prefix adder. Subclasses define prefix network that combines (generate, propagate) pairs.
+
+        Node i starts as (g[i], p[i]) of bit i, carry0 is merged into node 0.
+        combine(i, j) for j < i makes node i cover bits j's span too:
+            G[i] = G[i] | P[i] & G[j]
+            P[i] = P[i] & P[j]
+        When network is done, G[i] is carry out of bit i.
+    """
+    def prefix_network(self) -> List[List[Tuple[int, int]]]:
+        """ Return levels of (i, j) pairs, nodes of one level are combined in parallel """
+        raise NotImplementedError()
+
+    def elaborate(self, platform : Platform = None) -> Module:
+        m = Module()
+        comb = m.d.comb
+        n = self.input_width
+
+        propagates = [Signal(name=f"p{i}") for i in range(n)]
+        generates = [Signal(name=f"g{i}") for i in range(n)]
+        for i in range(n):
+            comb += propagates[i].eq(self.x[i] ^ self.y[i])
+            comb += generates[i].eq(self.x[i] & self.y[i])
+
+        g = list(generates)
+        p = list(propagates)
+        g0 = Signal(name="g0_carry")
+        comb += g0.eq(generates[0] | (propagates[0] & self.carry0))
+        g[0] = g0
+
+        for level, pairs in enumerate(self.prefix_network()):
+            new_g = list(g)
+            new_p = list(p)
+            for i, j in pairs:
+                new_g[i] = Signal(name=f"g{i}_l{level}")
+                new_p[i] = Signal(name=f"p{i}_l{level}")
+                comb += new_g[i].eq(g[i] | (p[i] & g[j]))
+                comb += new_p[i].eq(p[i] & p[j])
+            g, p = new_g, new_p
+
+        for i in range(n):
+            carry_in = self.carry0 if i == 0 else g[i - 1]
+            comb += self.out[i].eq(propagates[i] ^ carry_in)
+        comb += self.out[n].eq(g[n - 1])
+        return m
+
+
+class KoggeStoneAdder(PrefixAdder):
+    """ log2(n) levels, every node is combined on every level: minimal depth, maximal area """
+    def prefix_network(self):
+        levels = []
+        distance = 1
+        while distance < self.input_width:
+            levels.append([(i, i - distance) for i in range(distance, self.input_width)])
+            distance *= 2
+        return levels
+
+
+class SklanskyAdder(PrefixAdder):
+    """ log2(n) levels, node with bit k set combines with the last node of the lower half: minimal depth, high fan-out """
+    def prefix_network(self):
+        levels = []
+        distance = 1
+        while distance < self.input_width:
+            levels.append([(i, (i & ~(distance - 1)) - 1) for i in range(self.input_width) if i & distance])
+            distance *= 2
+        return levels
+
+
+class BrentKungAdder(PrefixAdder):
+    """ 2*log2(n)-1 levels: up-sweep builds power-of-two spans, down-sweep fills the rest. Minimal area """
+    def prefix_network(self):
+        n = self.input_width
+        levels = []
+        distance = 1
+        while distance < n:
+            levels.append([(i, i - distance) for i in range(2 * distance - 1, n, 2 * distance)])
+            distance *= 2
+        distance //= 4
+        while distance >= 1:
+            levels.append([(i, i - distance) for i in range(3 * distance - 1, n, 2 * distance)])
+            distance //= 2
+        return [level for level in levels if level]
+
+
+ADDERS = {
+    "ripple": RippleCarryAdder,
+    "cla": CarryLookAheadAdder,
+    "kogge-stone": KoggeStoneAdder,
+    "brent-kung": BrentKungAdder,
+    "sklansky": SklanskyAdder,
+}
+
+def make_adder(kind : str, n : int) -> Optional[AbstractAdder]:
+    """ Create adder of the kind from ADDERS. "yosys" returns None: `+` is left to synthesis """
+    if kind == "yosys":
+        return None
+    assert kind in ADDERS, f"unknown adder {kind}, expected yosys or one of {list(ADDERS)}"
+    return ADDERS[kind](n)
+
+
+#
+# FORMAL VERIFICATION
+#
+def __main():
+    """ Equivalence of the adder to `x + y + carry0`, or the bare adder with --no-proof """
+    parser = main_parser()
+    parser.add_argument("--adder", choices=list(ADDERS), default="kogge-stone")
+    parser.add_argument("--width", type=int, default=32)
+    parser.add_argument("--no-proof", action="store_true", help="generate only the adder, without reference sum and assert (for area/depth stats)")
+    args = parser.parse_args()
+
+    adder = make_adder(args.adder, args.width)
+    if args.no_proof:
+        main_runner(parser, args, adder, ports=adder.ports())
+        return
+
+    m = Module()
+    m.submodules.adder = adder
+    adder.prove(m)
+    main_runner(parser, args, m, ports=adder.ports())
+
+if __name__ == "__main__":
+    __main()
+
 
 